@@ -10,7 +10,7 @@ from utils.logging_utils import setup_logging
 import logging
 
 # Setup logger
-logger = setup_logging(config.LOGS_DIR)
+logger = setup_logging(config.LOGS_DIR, config.LOG_FORMAT, config.LOG_SAMPLE_RATES)
 
 if __name__ == "__main__":
     from cli import cli
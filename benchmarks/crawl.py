@@ -0,0 +1,246 @@
+"""
+End-to-end benchmark: WebCrawler.run_crawl against a synthetic local site
+
+Usage: python -m benchmarks.crawl [--pages 200] [--fanout 4] [--max-concurrent 5] [--output result.json]
+
+The site is served on 127.0.0.1 and needs no network access; rendering uses
+the local Chrome as in a real crawl. Crawler settings are taken from the
+environment / .env as usual, except those set by the options below. The
+result file records the site shape, the crawler settings and the measured
+numbers, so runs on different commits or machines can be compared.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Stages that run inside Chrome, and stages left out of the work total because
+# they only wait for a free slot or are already part of fetch / pdf_download
+CHROME_STAGES = ('chrome_load', 'settle', 'print_pdf')
+NOT_WORK_STAGES = ('host_wait', 'render_queue', 'dns', 'connect', 'ttfb', 'parse_hash')
+SITE_OPTIONS = ('pages', 'fanout', 'page_kb', 'pdf_ratio', 'pdf_kb', 'duplicate_ratio',
+                'slow_ratio', 'slow_delay', 'error_ratio', 'latency', 'seed')
+
+class SyntheticSite:
+    """Deterministic tree of HTML pages with PDF links, duplicates, slow and failing pages"""
+
+    def __init__(self, args):
+        self.args = args
+        rng = random.Random(args.seed)
+        ids = list(range(1, args.pages))
+        rng.shuffle(ids)
+        # Page 0 is the start page and always behaves
+        counts = [int(len(ids) * ratio) for ratio in (args.duplicate_ratio, args.slow_ratio, args.error_ratio)]
+        self.duplicates = set(ids[:counts[0]])
+        self.slow = set(ids[counts[0]:counts[0] + counts[1]])
+        self.errors = set(ids[counts[0] + counts[1]:sum(counts)])
+        self.with_pdf = set(rng.sample(range(args.pages), int(args.pages * args.pdf_ratio)))
+        self.requests = Counter()
+
+    def text(self, seed: int) -> str:
+        """Paragraphs of pseudo-random words filling roughly page_kb kilobytes"""
+        rng = random.Random(seed)
+        words = []
+        size = 0
+        while size < self.args.page_kb * 1024:
+            word = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9)))
+            words.append(word)
+            size += len(word) + 1
+        return '\n'.join(f"<p>{' '.join(words[i:i + 80])}</p>" for i in range(0, len(words), 80))
+
+    def page_html(self, n: int) -> str:
+        if n in self.duplicates:
+            # Byte-identical leaf pages, as templated sites produce
+            return f"<html><head><title>Notice</title></head><body>{self.text(-1)}</body></html>"
+        children = range(n * self.args.fanout + 1, min(self.args.pages, n * self.args.fanout + self.args.fanout + 1))
+        links = ''.join(f'<li><a href="/p/{child}">Page {child}</a></li>' for child in children)
+        if n in self.with_pdf:
+            links += f'<li><a href="/doc/{n}.pdf">Document {n}</a></li>'
+        return (f"<html><head><title>Page {n}</title></head><body><h1>Page {n}</h1>"
+                f"<ul>{links}</ul>{self.text(n)}</body></html>")
+
+    async def page(self, request):
+        from aiohttp import web
+        n = int(request.match_info.get('n', 0))
+        if n >= self.args.pages:
+            self.requests['not_found'] += 1
+            raise web.HTTPNotFound()
+        await asyncio.sleep(self.args.latency)
+        if n in self.slow:
+            self.requests['slow'] += 1
+            await asyncio.sleep(self.args.slow_delay)
+        if n in self.errors:
+            self.requests['error'] += 1
+            raise web.HTTPInternalServerError()
+        self.requests['page'] += 1
+        return web.Response(text=self.page_html(n), content_type='text/html')
+
+    async def pdf(self, request):
+        from aiohttp import web
+        self.requests['pdf'] += 1
+        await asyncio.sleep(self.args.latency)
+        n = int(request.match_info['n'])
+        body = b'%PDF-1.4\n' + random.Random(n).randbytes(self.args.pdf_kb * 1024) + b'\n%%EOF\n'
+        return web.Response(body=body, content_type='application/pdf')
+
+    async def robots(self, request):
+        from aiohttp import web
+        self.requests['robots'] += 1
+        return web.Response(text='User-agent: *\nAllow: /\n')
+
+    async def start(self, port: int):
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get('/', self.page)
+        app.router.add_get('/p/{n}', self.page)
+        app.router.add_get('/doc/{n}.pdf', self.pdf)
+        app.router.add_get('/robots.txt', self.robots)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', port).start()
+        return runner
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def peak_rss_mb(who) -> float:
+    """Peak resident set size in MB (ru_maxrss is KB on Linux, bytes on macOS)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(getattr(resource, who)).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+async def run(args, output_dir: Path) -> dict:
+    port = free_port()
+    # The crawler reads its configuration once, at import
+    os.environ.update({
+        'BASE_URLS': f"http://127.0.0.1:{port}/",
+        'OUTPUT_DIR': str(output_dir),
+        'CONTENT_INDEX_PATH': str(output_dir / 'content_index.sqlite'),
+        'MAX_PAGES': str(args.max_pages or args.pages * 2),
+        'MAX_DEPTH': str(args.depth),
+        'DELAY_BETWEEN_REQUESTS': str(args.delay),
+        'MAX_CONCURRENT': str(args.max_concurrent),
+        'INCREMENTAL_CRAWL': 'False'
+    })
+    for option, env in (('workers', 'CRAWL_WORKERS'), ('renderers', 'RENDERER_POOL_SIZE')):
+        if getattr(args, option):
+            os.environ[env] = str(getattr(args, option))
+    from crawler.config import config
+    from crawler.web_crawler import WebCrawler
+
+    site = SyntheticSite(args)
+    runner = await site.start(port)
+    try:
+        start = time.monotonic()
+        stats = await WebCrawler().run_crawl()
+        wall = time.monotonic() - start
+    finally:
+        await runner.cleanup()
+
+    stats_dict = stats.to_dict(config.REPORT_TOP_ERRORS)
+    timings = stats_dict['stage_timings']
+    chrome_seconds = sum(timings.get(stage, {}).get('total_seconds', 0.0) for stage in CHROME_STAGES)
+    work_seconds = sum(t['total_seconds'] for stage, t in timings.items() if stage not in NOT_WORK_STAGES)
+    processed = stats_dict['pages_crawled'] + stats_dict['pdfs_downloaded']
+    return {
+        'settings': {
+            'max_concurrent': config.MAX_CONCURRENT,
+            'crawl_workers': config.CRAWL_WORKERS,
+            'renderer_pool_size': config.RENDERER_POOL_SIZE,
+            'render_profile': config.RENDER_PROFILE,
+            'max_depth': config.MAX_DEPTH,
+            'max_pages': config.MAX_PAGES
+        },
+        'wall_seconds': round(wall, 2),
+        'pages_per_second': round(processed / wall, 3) if wall else 0.0,
+        'peak_rss_mb': peak_rss_mb('RUSAGE_SELF'),
+        # Chrome and chromedriver, once they have exited
+        'peak_child_rss_mb': peak_rss_mb('RUSAGE_CHILDREN'),
+        'chrome_seconds': round(chrome_seconds, 2),
+        # Share of the time spent working on pages (not waiting for slots) that went to Chrome
+        'chrome_time_share': round(chrome_seconds / work_seconds, 3) if work_seconds else 0.0,
+        'requests': dict(site.requests),
+        'pages_crawled': stats_dict['pages_crawled'],
+        'pdfs_downloaded': stats_dict['pdfs_downloaded'],
+        'duplicates_skipped': stats_dict['duplicates_skipped'],
+        'near_duplicates_skipped': stats_dict['near_duplicates_skipped'],
+        'errors_count': stats_dict['errors_count'],
+        'bytes_downloaded': stats_dict['bytes_downloaded'],
+        'stage_timings': timings
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    site = parser.add_argument_group('synthetic site')
+    site.add_argument('--pages', type=int, default=200, help='Number of HTML pages')
+    site.add_argument('--fanout', type=int, default=4, help='Links from each page to new pages')
+    site.add_argument('--page-kb', type=int, default=20, help='Text per page in KB')
+    site.add_argument('--pdf-ratio', type=float, default=0.2, help='Share of pages linking a PDF')
+    site.add_argument('--pdf-kb', type=int, default=100, help='Size of each PDF in KB')
+    site.add_argument('--duplicate-ratio', type=float, default=0.1, help='Share of pages with identical content')
+    site.add_argument('--slow-ratio', type=float, default=0.05, help='Share of pages answering after --slow-delay')
+    site.add_argument('--slow-delay', type=float, default=2.0)
+    site.add_argument('--error-ratio', type=float, default=0.05, help='Share of pages answering HTTP 500')
+    site.add_argument('--latency', type=float, default=0.05, help='Seconds added to every response')
+    site.add_argument('--seed', type=int, default=1)
+    crawl = parser.add_argument_group('crawler')
+    crawl.add_argument('--max-concurrent', type=int, default=5)
+    crawl.add_argument('--workers', type=int, default=None, help='CRAWL_WORKERS (default: MAX_CONCURRENT)')
+    crawl.add_argument('--renderers', type=int, default=None, help='RENDERER_POOL_SIZE')
+    crawl.add_argument('--depth', type=int, default=10, help='MAX_DEPTH')
+    crawl.add_argument('--max-pages', type=int, default=None, help='MAX_PAGES (default: enough for the whole site)')
+    crawl.add_argument('--delay', type=float, default=0.0, help='DELAY_BETWEEN_REQUESTS')
+    parser.add_argument('--output', default=None, help='Result file (default: crawl_benchmark_<timestamp>.json)')
+    parser.add_argument('--keep-output', action='store_true', help='Keep the PDFs, logs and reports of the run')
+    args = parser.parse_args()
+
+    output_dir = Path(tempfile.mkdtemp(prefix='crawl_benchmark_'))
+    try:
+        measured = asyncio.run(run(args, output_dir))
+    finally:
+        if not args.keep_output:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    result = {
+        'benchmark': 'crawl',
+        'timestamp': datetime.now().isoformat(),
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'cpu_count': os.cpu_count(),
+        'site': {key: getattr(args, key) for key in SITE_OPTIONS},
+        **measured
+    }
+    output = Path(args.output or f"crawl_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    output.write_text(json.dumps(result, indent=2))
+    print(json.dumps({key: result[key] for key in ('wall_seconds', 'pages_per_second', 'peak_rss_mb',
+                                                    'chrome_time_share', 'requests')}, indent=2))
+    print(f"Result written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -2,23 +2,31 @@ import click
 import asyncio
 from crawler.scheduler import start_scheduler
 from crawler.web_crawler import WebCrawler
+from crawler.distributed import CrawlCoordinator, CrawlWorker
+from crawler.work_queue import SQLiteWorkQueue
 from crawler.report_generator import ReportGenerator
 from crawler.config import config
+from crawler.pdf_store import PDFStore
 from utils.logging_utils import setup_logging
 import logging
 
 # Setup logger
-logger = setup_logging(config.LOGS_DIR)
+logger = setup_logging(config.LOGS_DIR, config.LOG_FORMAT, config.LOG_SAMPLE_RATES)
 
-async def run_crawl():
+async def run_crawl(resume_run_id=None, distributed=False, local_workers=0):
     """Run the crawl process"""
-    crawler = WebCrawler()
-    stats = await crawler.run_crawl()
-    stats_dict = stats.to_dict()  # Get the dictionary representation
+    if distributed:
+        stats = await CrawlCoordinator(resume_run_id).run(local_workers)
+    else:
+        crawler = WebCrawler()
+        stats = await crawler.run_crawl(resume_run_id)
+    stats_dict = stats.to_dict(config.REPORT_TOP_ERRORS)  # Get the dictionary representation
     
     # Pass dictionary to report generators
     ReportGenerator.generate_html_report(stats_dict)
     ReportGenerator.generate_json_report(stats_dict)
+    if config.METRICS_EXPORT:
+        ReportGenerator.generate_metrics_report(stats_dict)
     return stats_dict
 
 @click.group()
@@ -27,9 +35,22 @@ def cli():
     pass
 
 @cli.command()
-def crawl():
+@click.option('--resume', 'resume_run_id', default=None, help='Resume an unfinished run from its checkpoint')
+@click.option('--distributed', is_flag=True, help='Crawl through a shared work queue that `worker` processes drain')
+@click.option('--local-workers', default=0, type=int, help='Worker processes to start on this machine (with --distributed)')
+def crawl(resume_run_id, distributed, local_workers):
     """Run crawl once"""
-    asyncio.run(run_crawl())
+    asyncio.run(run_crawl(resume_run_id, distributed, local_workers))
+
+@cli.command()
+@click.option('--run-id', default=None, help='Distributed run to join (default: the newest unfinished one)')
+@click.option('--worker-id', default=None, help='Name prefix of this worker; its pid is appended (default: host)')
+def worker(run_id, worker_id):
+    """Crawl URLs leased from a distributed run until it is done"""
+    run_id = run_id or SQLiteWorkQueue.latest_unfinished(config.QUEUE_DIR)
+    if run_id is None:
+        raise click.ClickException(f"No unfinished distributed run in {config.QUEUE_DIR}")
+    asyncio.run(CrawlWorker(run_id, worker_id).run())
 
 @cli.command()
 @click.option('--hours', default=12, type=int, help='Schedule interval in hours')
@@ -37,5 +58,13 @@ def schedule(hours):
     """Start the scheduler"""
     start_scheduler(hours)
 
+@cli.command()
+@click.option('--dry-run', is_flag=True, help='Only report what would be deleted')
+def gc(dry_run):
+    """Delete stored PDFs that no run manifest references"""
+    removed, freed = PDFStore(config.PDFS_DIR).collect_garbage(dry_run)
+    action = 'Would remove' if dry_run else 'Removed'
+    click.echo(f"{action} {removed} unreferenced PDFs ({freed / 1024 / 1024:.1f} MiB)")
+
 if __name__ == "__main__":
     cli()
\ No newline at end of file
@@ -0,0 +1,60 @@
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class CrawlCheckpoint:
+    """On-disk snapshot of a crawl run so it can be resumed after a crash"""
+
+    def __init__(self, run_id: str, directory: Path):
+        self.run_id = run_id
+        self.path = directory / f"{run_id}.json"
+
+    @classmethod
+    def new(cls, directory: Path) -> 'CrawlCheckpoint':
+        """Create a checkpoint for a fresh run"""
+        # Microseconds keep runs started within the same second apart
+        return cls(datetime.now().strftime('%Y%m%d_%H%M%S_%f'), directory)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def load(self) -> Dict:
+        """Read the last saved state"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self, state: Dict):
+        """Write state atomically so a crash mid-write keeps the previous checkpoint"""
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, default=str)
+        os.replace(temp_path, self.path)
+        logger.info(f"Checkpoint saved: {self.path}")
+
+    @staticmethod
+    def latest_unfinished(directory: Path, max_age: Optional[timedelta] = None) -> Optional[str]:
+        """Get the run id of the newest checkpoint if that run never finished
+
+        Older unfinished runs were superseded by a newer one and are not
+        resumed, nor is a run last saved more than max_age ago.
+        """
+        for path in sorted(directory.glob('*.json'), reverse=True):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+                continue
+            if state.get('finished'):
+                return None
+            saved_at = state.get('saved_at')
+            if max_age is not None and saved_at and datetime.now() - datetime.fromisoformat(saved_at) > max_age:
+                logger.info(f"Not resuming run {path.stem}, last saved at {saved_at}")
+                return None
+            return path.stem
+        return None
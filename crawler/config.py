@@ -1,7 +1,15 @@
 import os
 from pathlib import Path
+from typing import Tuple
 from utils.file_utils import create_directories
+from urllib.parse import urlparse
+from utils.url_utils import normalize_host
 from decouple import config, Csv
+from crawler.render_profile import RENDER_PROFILES
+from crawler.seen_store import SEEN_STORES
+from crawler.pdf_store import PDF_LINK_MODES
+from crawler.work_queue import WORK_QUEUE_BACKENDS
+from utils.logging_utils import LOG_FORMATS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,15 +30,170 @@ class Config:
         # Crawler settings
         self.MAX_DEPTH = config('MAX_DEPTH', default=3, cast=int)
         self.MAX_PAGES = config('MAX_PAGES', default=100, cast=int)
+        
+        # Per-site budgets: SITE_MAX_PAGES applies to every site (0 = only MAX_PAGES),
+        # SITE_BUDGETS overrides it with "domain=pages[:depth]" pairs separated by ';'
+        self.SITE_MAX_PAGES = config('SITE_MAX_PAGES', default=0, cast=int)
+        self.SITE_BUDGETS = {}
+        for item in config('SITE_BUDGETS', default='').split(';'):
+            domain, _, budget = item.partition('=')
+            if domain.strip() and budget.strip():
+                pages, _, depth = budget.partition(':')
+                self.SITE_BUDGETS[domain.strip().lower()] = (
+                    int(pages) if pages.strip() else self.SITE_MAX_PAGES,
+                    int(depth) if depth.strip() else self.MAX_DEPTH
+                )
         self.DELAY_BETWEEN_REQUESTS = config('DELAY_BETWEEN_REQUESTS', default=1.0, cast=float)
         self.TIMEOUT = config('TIMEOUT', default=30, cast=int)
         self.MAX_CONCURRENT = config('MAX_CONCURRENT', default=5, cast=int)
+        self.CRAWL_WORKERS = config('CRAWL_WORKERS', default=self.MAX_CONCURRENT, cast=int)
+        
+        # Shared HTTP client: MAX_CONCURRENT caps total connections
+        self.DNS_CACHE_TTL = config('DNS_CACHE_TTL', default=300, cast=int)
+        self.KEEPALIVE_TIMEOUT = config('KEEPALIVE_TIMEOUT', default=30, cast=float)
+        
+        # Per-host politeness: DELAY_BETWEEN_REQUESTS is the minimum interval
+        # between requests to one host (raised by robots.txt Crawl-delay)
+        self.HOST_BURST = config('HOST_BURST', default=1, cast=int)
+        self.HOST_MAX_CONCURRENCY = config('HOST_MAX_CONCURRENCY', default=4, cast=int)
+        self.HOST_SLOW_THRESHOLD = config('HOST_SLOW_THRESHOLD', default=5.0, cast=float)
+        self.RESPECT_ROBOTS_TXT = config('RESPECT_ROBOTS_TXT', default=True, cast=bool)
+        
+        # Sitemap discovery: each site's robots.txt Sitemap: files (or /sitemap.xml)
+        # seed its frontier; at most SITEMAP_MAX_FILES files and SITEMAP_MAX_URLS URLs per site
+        self.SITEMAP_DISCOVERY = config('SITEMAP_DISCOVERY', default=True, cast=bool)
+        self.SITEMAP_MAX_FILES = config('SITEMAP_MAX_FILES', default=50, cast=int)
+        self.SITEMAP_MAX_URLS = config('SITEMAP_MAX_URLS', default=100_000, cast=int)
+        
+        # Frontier priority: the highest scoring queued URL is crawled next (see
+        # crawler.frontier.UrlScorer); all weights 0 crawls in discovery order.
+        # PRIORITY_RULES adds "glob=weight" pairs separated by ';', matched
+        # against the whole URL, e.g. "*/es/*=-5;*/documents/*=3"
+        self.PRIORITY_DEPTH_WEIGHT = config('PRIORITY_DEPTH_WEIGHT', default=1.0, cast=float)
+        self.PRIORITY_PDF_WEIGHT = config('PRIORITY_PDF_WEIGHT', default=2.0, cast=float)
+        self.PRIORITY_INLINK_WEIGHT = config('PRIORITY_INLINK_WEIGHT', default=0.5, cast=float)
+        self.PRIORITY_FRESHNESS_WEIGHT = config('PRIORITY_FRESHNESS_WEIGHT', default=1.0, cast=float)
+        self.PRIORITY_RULES = {}
+        for item in config('PRIORITY_RULES', default='').split(';'):
+            pattern, _, weight = item.rpartition('=')
+            if pattern.strip() and weight.strip():
+                self.PRIORITY_RULES[pattern.strip()] = float(weight)
+        
+        # Renderer pool settings
+        self.RENDERER_POOL_SIZE = config('RENDERER_POOL_SIZE', default=min(self.CRAWL_WORKERS, os.cpu_count() or 1), cast=int)
+        self.RENDERER_MAX_PAGES = config('RENDERER_MAX_PAGES', default=50, cast=int)
+        self.RENDER_TIMEOUT = config('RENDER_TIMEOUT', default=self.TIMEOUT * 2, cast=int)
+        
+        # Render profile: 'full' loads everything, 'light' blocks trackers,
+        # media, web fonts and embeds, 'text' also turns images off
+        self.RENDER_PROFILE = config('RENDER_PROFILE', default='full').strip().lower()
+        if self.RENDER_PROFILE not in RENDER_PROFILES:
+            logger.error(f"Unknown RENDER_PROFILE: {self.RENDER_PROFILE}")
+            raise ValueError(f"RENDER_PROFILE must be one of {', '.join(RENDER_PROFILES)}")
+        self.RENDER_BLOCKED_URLS = config('RENDER_BLOCKED_URLS', default='', cast=Csv())
+        
+        # HTML pages are streamed in PAGE_CHUNK_SIZE chunks and cut off at MAX_PAGE_BYTES
+        self.PAGE_CHUNK_SIZE = config('PAGE_CHUNK_SIZE', default=64 * 1024, cast=int)
+        self.MAX_PAGE_BYTES = config('MAX_PAGE_BYTES', default=20 * 1024 * 1024, cast=int)
+        
+        # URL patterns (ids blanked out) whose last CONTENT_TYPE_MIN_SAMPLES responses
+        # were all neither HTML nor PDF are skipped without a request; 0 fetches everything
+        self.CONTENT_TYPE_MIN_SAMPLES = config('CONTENT_TYPE_MIN_SAMPLES', default=3, cast=int)
+        
+        # Bytes per chunk when streaming PDFs to disk
+        self.PDF_CHUNK_SIZE = config('PDF_CHUNK_SIZE', default=256 * 1024, cast=int)
+        
+        # Page settle settings (seconds)
+        self.SETTLE_IDLE_TIME = config('SETTLE_IDLE_TIME', default=0.5, cast=float)
+        self.SETTLE_MAX_WAIT = config('SETTLE_MAX_WAIT', default=10.0, cast=float)
+        self.SETTLE_MAX_INFLIGHT = config('SETTLE_MAX_INFLIGHT', default=2, cast=int)
+        # "domain=selector" pairs separated by ';', e.g. "fdic.gov=#main-content"
+        settle_selectors = config('SETTLE_SELECTORS', default='')
+        self.SETTLE_SELECTORS = dict(
+            (domain.strip().lower(), selector.strip())
+            for domain, _, selector in (item.partition('=') for item in settle_selectors.split(';'))
+            if domain.strip() and selector.strip()
+        )
         
         # Output settings
         self.OUTPUT_DIR = Path(config('OUTPUT_DIR', default='crawler_output')).resolve()
         self.LOGS_DIR = self.OUTPUT_DIR / 'logs'
         self.PDFS_DIR = self.OUTPUT_DIR / 'pdfs'
         self.REPORTS_DIR = self.OUTPUT_DIR / 'reports'
+        self.CHECKPOINTS_DIR = self.OUTPUT_DIR / 'checkpoints'
+        self.SEEN_DIR = self.OUTPUT_DIR / 'seen'
+        
+        # Log lines go through a queue to a background writer. LOG_FORMAT is 'text'
+        # or 'json' (one object per line). LOG_SAMPLE_RATES keeps a share of the
+        # per-URL lines at a level, picked by URL, as "LEVEL=rate" pairs separated
+        # by ';', e.g. "INFO=0.1"; other lines are always kept
+        self.LOG_FORMAT = config('LOG_FORMAT', default='text').strip().lower()
+        if self.LOG_FORMAT not in LOG_FORMATS:
+            logger.error(f"Unknown LOG_FORMAT: {self.LOG_FORMAT}")
+            raise ValueError(f"LOG_FORMAT must be one of {', '.join(LOG_FORMATS)}")
+        self.LOG_SAMPLE_RATES = {}
+        for item in config('LOG_SAMPLE_RATES', default='').split(';'):
+            level, _, rate = item.partition('=')
+            if level.strip() and rate.strip():
+                if not isinstance(logging.getLevelName(level.strip().upper()), int):
+                    logger.error(f"Unknown log level in LOG_SAMPLE_RATES: {level.strip()}")
+                    raise ValueError("LOG_SAMPLE_RATES levels must be DEBUG, INFO, WARNING, ERROR or CRITICAL")
+                self.LOG_SAMPLE_RATES[level.strip().upper()] = float(rate)
+        self.QUEUE_DIR = self.OUTPUT_DIR / 'queue'
+        
+        # PDFs are stored once per content hash under PDFS_DIR/blobs; each run also
+        # gets readable 'hardlink' or 'symlink' copies under PDFS_DIR/runs/<run_id> ('none' to skip)
+        self.PDF_LINK_MODE = config('PDF_LINK_MODE', default='hardlink').strip().lower()
+        if self.PDF_LINK_MODE not in PDF_LINK_MODES:
+            logger.error(f"Unknown PDF_LINK_MODE: {self.PDF_LINK_MODE}")
+            raise ValueError(f"PDF_LINK_MODE must be one of {', '.join(PDF_LINK_MODES)}")
+        
+        # Seconds between crawl checkpoints
+        self.CHECKPOINT_INTERVAL = config('CHECKPOINT_INTERVAL', default=30, cast=int)
+        
+        # Distributed crawls (crawl --distributed, worker): the run's frontier, dedup
+        # index and budgets live in a WORK_QUEUE_BACKEND queue under QUEUE_DIR. Workers
+        # lease URLs for LEASE_SECONDS, renewed while alive; a URL whose lease expired
+        # LEASE_MAX_ATTEMPTS times is given up. Idle workers poll every QUEUE_POLL_INTERVAL seconds
+        self.WORK_QUEUE_BACKEND = config('WORK_QUEUE_BACKEND', default='sqlite').strip().lower()
+        if self.WORK_QUEUE_BACKEND not in WORK_QUEUE_BACKENDS:
+            logger.error(f"Unknown WORK_QUEUE_BACKEND: {self.WORK_QUEUE_BACKEND}")
+            raise ValueError(f"WORK_QUEUE_BACKEND must be one of {', '.join(WORK_QUEUE_BACKENDS)}")
+        self.LEASE_SECONDS = config('LEASE_SECONDS', default=300, cast=float)
+        self.LEASE_MAX_ATTEMPTS = config('LEASE_MAX_ATTEMPTS', default=3, cast=int)
+        self.QUEUE_POLL_INTERVAL = config('QUEUE_POLL_INTERVAL', default=1.0, cast=float)
+        
+        # Incremental crawl settings
+        self.INCREMENTAL_CRAWL = config('INCREMENTAL_CRAWL', default=True, cast=bool)
+        self.CONTENT_INDEX_PATH = Path(config('CONTENT_INDEX_PATH', default='content_index.sqlite')).resolve()
+        
+        # Near-duplicate detection: HTML pages whose main text is at least
+        # NEAR_DUPLICATE_SIMILARITY alike (SimHash bits) to an archived page are
+        # not rendered; pages under NEAR_DUPLICATE_MIN_WORDS words are always rendered
+        self.NEAR_DUPLICATE_DETECTION = config('NEAR_DUPLICATE_DETECTION', default=True, cast=bool)
+        self.NEAR_DUPLICATE_SIMILARITY = config('NEAR_DUPLICATE_SIMILARITY', default=0.95, cast=float)
+        self.NEAR_DUPLICATE_MIN_WORDS = config('NEAR_DUPLICATE_MIN_WORDS', default=50, cast=int)
+        
+        # Seen-URL and PDF checksum stores: 'set' keeps strings, 'fingerprint'
+        # keeps 64-bit hashes, 'bloom' trades exactness for a fixed size,
+        # 'disk' spills fingerprints to SQLite past SEEN_MEMORY_LIMIT entries
+        self.SEEN_STORE = config('SEEN_STORE', default='fingerprint').strip().lower()
+        if self.SEEN_STORE not in SEEN_STORES:
+            logger.error(f"Unknown SEEN_STORE: {self.SEEN_STORE}")
+            raise ValueError(f"SEEN_STORE must be one of {', '.join(SEEN_STORES)}")
+        self.SEEN_BLOOM_CAPACITY = config('SEEN_BLOOM_CAPACITY', default=1_000_000, cast=int)
+        self.SEEN_BLOOM_ERROR_RATE = config('SEEN_BLOOM_ERROR_RATE', default=0.001, cast=float)
+        self.SEEN_MEMORY_LIMIT = config('SEEN_MEMORY_LIMIT', default=100_000, cast=int)
+        
+        # Errors are spooled to LOGS_DIR/errors_<run_id>.jsonl; memory and reports keep
+        # ERROR_SAMPLES examples per error class and host, REPORT_TOP_ERRORS groups,
+        # and the full list is paged REPORT_ERRORS_PER_PAGE at a time
+        self.ERROR_SAMPLES = config('ERROR_SAMPLES', default=5, cast=int)
+        self.REPORT_TOP_ERRORS = config('REPORT_TOP_ERRORS', default=20, cast=int)
+        self.REPORT_ERRORS_PER_PAGE = config('REPORT_ERRORS_PER_PAGE', default=500, cast=int)
+        
+        # Also write a Prometheus text-format metrics file to REPORTS_DIR
+        self.METRICS_EXPORT = config('METRICS_EXPORT', default=False, cast=bool)
         
         # Schedule settings
         self.SCHEDULE_HOURS = config('SCHEDULE_HOURS', default=12, cast=int)
@@ -43,8 +206,16 @@ class Config:
         
         self.ALLOWED_EXTENSIONS = {'.pdf', '.html', '.htm', '.aspx', '.php'}
         
+        # Query parameters dropped during URL canonicalization (fnmatch patterns)
+        self.STRIP_QUERY_PARAMS = config(
+            'STRIP_QUERY_PARAMS',
+            default='utm_*,gclid,fbclid,msclkid,mc_cid,mc_eid,_ga,jsessionid,phpsessid,aspsessionid*,sessionid,sid',
+            cast=Csv()
+        )
+        
         # Create directories
-        directories = [self.OUTPUT_DIR, self.LOGS_DIR, self.PDFS_DIR, self.REPORTS_DIR]
+        directories = [self.OUTPUT_DIR, self.LOGS_DIR, self.PDFS_DIR, self.REPORTS_DIR, self.CHECKPOINTS_DIR, self.SEEN_DIR,
+                       self.QUEUE_DIR]
         create_directories(directories)
         
         # Log configuration
@@ -54,7 +225,18 @@ class Config:
                    f"DELAY={self.DELAY_BETWEEN_REQUESTS}s, "
                    f"TIMEOUT={self.TIMEOUT}s, "
                    f"CONCURRENT={self.MAX_CONCURRENT}, "
+                   f"WORKERS={self.CRAWL_WORKERS}, "
+                   f"RENDERERS={self.RENDERER_POOL_SIZE}, "
+                   f"PROFILE={self.RENDER_PROFILE}, "
                    f"OUTPUT_DIR={self.OUTPUT_DIR}")
 
+    def site_budget(self, base_url: str) -> Tuple[int, int]:
+        """Get the (max pages, max depth) budget for a base URL"""
+        host = normalize_host(urlparse(base_url).hostname or '')
+        for domain, budget in self.SITE_BUDGETS.items():
+            if host == domain or host.endswith('.' + domain):
+                return budget
+        return self.SITE_MAX_PAGES, self.MAX_DEPTH
+
 # Create config instance
-config = Config()
\ No newline at end of file
+config = Config()
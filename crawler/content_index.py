@@ -0,0 +1,123 @@
+import asyncio
+import json
+import logging
+import sqlite3
+from concurrent.futures import Executor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+class IndexEntry(NamedTuple):
+    """What the last run stored for a URL"""
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: Optional[str]
+    stored_path: Optional[str]
+    links: List[str]
+    simhash: Optional[int] = None  # near-duplicate fingerprint of the page text
+    updated_at: Optional[str] = None  # when it was last fetched and stored
+
+    def has_stored_copy(self) -> bool:
+        """Check the file saved for this URL is still on disk"""
+        return bool(self.stored_path) and Path(self.stored_path).exists()
+
+    def is_current(self, content_hash: Optional[str]) -> bool:
+        """Check whether a fetch result (None for 304) matches the stored copy"""
+        if not self.has_stored_copy():
+            return False
+        return content_hash is None or content_hash == self.content_hash
+
+    def unchanged_since(self, lastmod: datetime) -> bool:
+        """Check the stored copy was fetched after a sitemap <lastmod>"""
+        if not self.updated_at or not self.has_stored_copy():
+            return False
+        # updated_at is local time
+        return datetime.fromisoformat(self.updated_at).astimezone() >= lastmod
+
+
+class ContentIndex:
+    """Persistent cross-run index of fetched URLs for incremental re-crawls"""
+
+    def __init__(self, db_path: Path, enabled: bool = True):
+        self.enabled = enabled
+        # Set by distributed workers so that lookups and writes, like their
+        # other database calls, run off the event loop; see get_async/put_async
+        self.executor: Optional[Executor] = None
+        self.conn = sqlite3.connect(str(db_path), isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                stored_path TEXT,
+                links TEXT,
+                updated_at TEXT
+            )
+        ''')
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(pages)')}
+        if 'simhash' not in columns:
+            # Indexes written before near-duplicate detection
+            self.conn.execute('ALTER TABLE pages ADD COLUMN simhash TEXT')
+
+    def get(self, url: str) -> Optional[IndexEntry]:
+        """Look up what a previous run stored for a URL"""
+        if not self.enabled:
+            return None
+
+        row = self.conn.execute(
+            'SELECT url, etag, last_modified, content_hash, stored_path, links, simhash, updated_at FROM pages WHERE url = ?',
+            (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return IndexEntry(*row[:5], links=json.loads(row[5] or '[]'), simhash=int(row[6], 16) if row[6] else None,
+                          updated_at=row[7])
+
+    async def get_async(self, url: str) -> Optional[IndexEntry]:
+        """get() on the executor, if one is set"""
+        if self.executor is None:
+            return self.get(url)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.get, url)
+
+    @staticmethod
+    def conditional_headers(entry: Optional[IndexEntry]) -> Dict[str, str]:
+        """Build If-None-Match / If-Modified-Since headers for a re-fetch"""
+        headers = {}
+        # Without the stored file a 304 would leave nothing to point at
+        if entry is None or not entry.has_stored_copy():
+            return headers
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str],
+            content_hash: str, stored_path: str, links: List[str], simhash: Optional[int] = None):
+        """Record the current state of a URL"""
+        self.conn.execute(
+            'INSERT OR REPLACE INTO pages (url, etag, last_modified, content_hash, stored_path, links, updated_at, simhash) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (url, etag, last_modified, content_hash, stored_path,
+             json.dumps(links), datetime.now().isoformat(),
+             f"{simhash:016x}" if simhash is not None else None)
+        )
+
+    async def put_async(self, url: str, etag: Optional[str], last_modified: Optional[str],
+                        content_hash: str, stored_path: str, links: List[str], simhash: Optional[int] = None):
+        """put() on the executor, if one is set"""
+        if self.executor is None:
+            self.put(url, etag, last_modified, content_hash, stored_path, links, simhash)
+        else:
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.put, url, etag, last_modified, content_hash, stored_path, links, simhash)
+
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
@@ -0,0 +1,131 @@
+import re
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit
+from crawler.link_extractor import LinkExtractor
+
+HTML = 'html'
+PDF = 'pdf'
+OTHER = 'other'
+
+PDF_MAGIC = b'%PDF-'
+# Readers accept the %PDF- header anywhere in the first kilobyte
+SNIFF_BYTES = 1024
+PDF_CONTENT_TYPES = {'application/pdf', 'application/x-pdf'}
+UNTYPED_CONTENT_TYPES = {'', 'application/octet-stream', 'binary/octet-stream', 'application/download'}
+HTML_PREFIXES = (b'<!doctype html', b'<html', b'<head', b'<body', b'<!--')
+DISPOSITION_FILENAME_RE = re.compile(r'filename\*?\s*=\s*(?:[\w-]+\'[\w-]*\')?"?([^";]+)', re.IGNORECASE)
+# Ids in paths and query values: numbers, hex digests, UUIDs
+ID_RE = re.compile(r'[0-9a-f-]{16,}|\d+', re.IGNORECASE)
+# Patterns remembered before new ones are ignored
+MAX_PATTERNS = 10000
+
+def declared_kind(content_type: str, content_disposition: str = '') -> Optional[str]:
+    """What the response headers say the body is; None when they don't say"""
+    match = DISPOSITION_FILENAME_RE.search(content_disposition or '')
+    filename = match.group(1).strip().lower() if match else ''
+    mime = (content_type or '').split(';')[0].strip().lower()
+    if mime in PDF_CONTENT_TYPES or filename.endswith('.pdf'):
+        return PDF
+    if LinkExtractor.is_html(mime):
+        return HTML
+    if mime in UNTYPED_CONTENT_TYPES:
+        return None
+    return OTHER
+
+def sniff(head: bytes) -> Optional[str]:
+    """What the first bytes of a body look like; None when they could be anything"""
+    if PDF_MAGIC in head[:SNIFF_BYTES]:
+        return PDF
+    start = head.lstrip(b'\xef\xbb\xbf \t\r\n')[:64].lower()
+    if start.startswith(HTML_PREFIXES):
+        return HTML
+    return None
+
+def classify(content_type: str, content_disposition: str, head: bytes) -> str:
+    """Decide whether a response is a PDF to download, HTML to render or neither
+
+    The magic bytes win over the headers: PDFs served as text/html or
+    application/octet-stream are still PDFs, and a body served as a PDF
+    without a %PDF- header (typically an error or login page) is not one.
+    """
+    sniffed = sniff(head)
+    if sniffed is not None:
+        return sniffed
+    declared = declared_kind(content_type, content_disposition)
+    if declared == PDF and head:
+        return OTHER
+    return declared or OTHER
+
+async def read_head(response, size: int = SNIFF_BYTES) -> bytes:
+    """Read up to size bytes from the start of a response body"""
+    head = b''
+    while len(head) < size:
+        chunk = await response.content.read(size - len(head))
+        if not chunk:
+            break
+        head += chunk
+    return head
+
+async def iter_body(response, head: bytes, chunk_size: int) -> AsyncIterator[bytes]:
+    """The whole body in chunks, starting with the head already read"""
+    if head:
+        yield head
+    async for chunk in response.content.iter_chunked(chunk_size):
+        yield chunk
+
+def url_pattern(url: str) -> str:
+    """Host and path with ids blanked out, so URLs of one kind share a pattern
+
+    Query names and non-numeric values are kept: ?format=pdf and
+    ?format=html are different patterns, ?id=1 and ?id=2 the same.
+    """
+    parsed = urlsplit(url)
+    pattern = parsed.netloc.lower() + ID_RE.sub('*', parsed.path)
+    if parsed.query:
+        pattern += '?' + ID_RE.sub('*', parsed.query)
+    return pattern
+
+
+class ContentTypeCache:
+    """Kinds of the responses seen per URL pattern
+
+    A pattern is predicted once min_samples responses agreed on its kind;
+    a single disagreeing response makes it unpredictable for the rest of
+    the run. A min_samples of 0 turns prediction off.
+    """
+
+    def __init__(self, min_samples: int = 3):
+        self.min_samples = min_samples
+        self.patterns: Dict[str, List] = {}  # pattern -> [kind or None if mixed, count]
+
+    def observe(self, url: str, kind: str):
+        """Record the kind of a fetched URL"""
+        pattern = url_pattern(url)
+        entry = self.patterns.get(pattern)
+        if entry is None:
+            if len(self.patterns) < MAX_PATTERNS:
+                self.patterns[pattern] = [kind, 1]
+        elif entry[0] == kind:
+            entry[1] += 1
+        else:
+            entry[0] = None
+
+    def predict(self, url: str) -> Optional[str]:
+        """The kind URLs like this one consistently had, if known"""
+        if not self.min_samples:
+            return None
+        entry = self.patterns.get(url_pattern(url))
+        if entry is None or entry[0] is None or entry[1] < self.min_samples:
+            return None
+        return entry[0]
+
+    def snapshot(self) -> Dict[str, List]:
+        """Get a copy of the patterns as JSON-friendly data"""
+        return {pattern: list(entry) for pattern, entry in self.patterns.items()}
+
+    def restore(self, snapshot: Dict[str, List]):
+        """Reload patterns saved by snapshot()"""
+        self.patterns = {pattern: list(entry) for pattern, entry in snapshot.items()}
+
+    def __len__(self) -> int:
+        return len(self.patterns)
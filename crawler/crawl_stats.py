@@ -1,71 +1,246 @@
 import asyncio
 from datetime import datetime
-from typing import Dict, Set, List
+from typing import Dict, Set, List, Optional
+from crawler.error_log import ErrorLog
+from crawler.metrics import CrawlMetrics
+from crawler.seen_store import ExactSeenStore, restore_seen_store
 
 class CrawlStats:
-    """Statistics tracking for crawl operations with MAX_PAGES limit"""
+    """Statistics tracking for crawl operations with MAX_PAGES limit
+
+    Counters are plain attributes updated from the event loop thread, where
+    every method here runs to completion without yielding, so no locks are
+    needed. Thread or process workers keep their own CrawlStats and hand its
+    state_dict() to merge() on the loop thread, from other threads through
+    merge_threadsafe().
+    """
+    
+    # Counters summed by merge()
+    COUNTERS = ('pages_crawled', 'pdfs_found', 'pdfs_downloaded', 'duplicates_skipped',
+                'unchanged_skipped', 'near_duplicates_skipped')
     
-    def __init__(self, max_pages: int):
+    def __init__(self, max_pages: int, pdf_checksums=None, metrics: Optional[CrawlMetrics] = None,
+                 errors: Optional[ErrorLog] = None):
         self.start_time = datetime.now()
         self.max_pages = max_pages
         self.pages_crawled = 0
         self.pdfs_found = 0
         self.pdfs_downloaded = 0
-        self.errors: List[dict] = []
+        self.reserved = 0  # page slots held by URLs still being processed
+        # Spooled to disk when the ErrorLog has a path; only counts and samples stay in memory
+        self.errors = errors if errors is not None else ErrorLog()
         self.duplicates_skipped = 0
+        self.unchanged_skipped = 0
+        self.near_duplicates_skipped = 0
         self.visited_urls: Set[str] = set()
-        self.pdf_checksums: Set[str] = set()
-        self.lock = asyncio.Lock()
+        # Any crawler.seen_store store; seen_stores lists every store for memory reporting
+        self.pdf_checksums = pdf_checksums if pdf_checksums is not None else ExactSeenStore()
+        self.seen_stores = {'pdf_checksums': self.pdf_checksums}
+        self.site_pages: Dict[str, int] = {}
+        self.metrics = metrics if metrics is not None else CrawlMetrics()
     
-    async def record_html_page(self):
+    def record_html_page(self):
         """Record a successfully converted HTML page"""
-        async with self.lock:
-            self.pages_crawled += 1
+        self.pages_crawled += 1
     
-    async def record_pdf_download(self):
+    def record_pdf_download(self):
         """Record a successfully downloaded PDF"""
-        async with self.lock:
-            self.pdfs_downloaded += 1
+        self.pdfs_downloaded += 1
     
-    async def record_pdf_found(self):
+    def record_pdf_found(self):
         """Record a PDF found (will be downloaded)"""
-        async with self.lock:
-            self.pdfs_found += 1
+        self.pdfs_found += 1
     
-    async def record_duplicate(self):
+    def record_duplicate(self):
         """Record a duplicate PDF skipped"""
-        async with self.lock:
-            self.duplicates_skipped += 1
+        self.duplicates_skipped += 1
+    
+    def record_unchanged(self):
+        """Record a URL skipped because it is unchanged since the last run"""
+        self.unchanged_skipped += 1
     
-    async def total_processed(self) -> int:
+    def record_near_duplicate(self):
+        """Record an HTML page not rendered because it nearly duplicates an archived one"""
+        self.near_duplicates_skipped += 1
+    
+    def total_processed(self) -> int:
         """Get total processed pages (HTML conversions + PDF downloads)"""
-        async with self.lock:
-            return self.pages_crawled + self.pdfs_downloaded
+        return self.pages_crawled + self.pdfs_downloaded
     
-    async def has_reached_limit(self) -> bool:
+    def has_reached_limit(self) -> bool:
         """Check if MAX_PAGES limit has been reached"""
-        async with self.lock:
-            return (self.pages_crawled + self.pdfs_downloaded) >= self.max_pages
+        return self.total_processed() >= self.max_pages
     
-    async def add_error(self, url: str, error: str):
+    def reserve_page(self) -> bool:
+        """Claim one of the remaining MAX_PAGES slots for a URL about to be processed
+
+        Slots held by other URLs count as used, so concurrent workers cannot
+        overshoot the limit. Every successful call needs a release_page().
+        """
+        if self.total_processed() + self.reserved >= self.max_pages:
+            return False
+        self.reserved += 1
+        return True
+    
+    def release_page(self):
+        """Give back a slot once its URL is done, whether or not it was counted
+
+        Called right after the record_*() call for the URL, with nothing
+        awaited in between, so a page is never counted twice.
+        """
+        self.reserved -= 1
+    
+    def add_error(self, url: str, error: str):
         """Add an error to the statistics"""
-        async with self.lock:
-            self.errors.append({
-                'url': url,
-                'error': error,
-                'timestamp': datetime.now().isoformat()
-            })
-    
-    def to_dict(self) -> Dict:
-        """Convert stats to dictionary for reporting"""
+        self.errors.add(url, error)
+    
+    def merge(self, state: Dict):
+        """Add the counters of a worker's CrawlStats.state_dict() to this run's
+
+        Like the record_*() methods, only call this on the thread of the
+        event loop that updates these stats. pdf_checksums are not merged, as
+        each worker only sees the duplicates it rendered itself.
+        """
+        for counter in self.COUNTERS:
+            setattr(self, counter, getattr(self, counter) + state.get(counter, 0))
+        self.errors.merge(state.get('errors', {}))
+        for base_url, pages in state.get('site_pages', {}).items():
+            self.site_pages[base_url] = self.site_pages.get(base_url, 0) + pages
+        self.metrics.merge(state.get('metrics', {}))
+    
+    def merge_threadsafe(self, state: Dict, loop: asyncio.AbstractEventLoop):
+        """merge() from another thread: run it on the stats' loop and wait until it is done
+
+        Must not be called from that loop's own thread, which would wait on itself.
+        """
+        async def merge():
+            self.merge(state)
+        asyncio.run_coroutine_threadsafe(merge(), loop).result()
+    
+    def track_seen_store(self, name: str, store):
+        """Include a seen-store in the memory figures of the report"""
+        self.seen_stores[name] = store
+    
+    def seen_store_usage(self) -> Dict[str, Dict]:
+        """Get the kind, size and memory footprint of every tracked seen-store"""
+        return {
+            name: {'kind': store.kind, 'entries': len(store), 'memory_bytes': store.memory_bytes()}
+            for name, store in self.seen_stores.items()
+        }
+    
+    def state_dict(self) -> Dict:
+        """Get a copy of the full counter state for a checkpoint
+
+        Nothing in it is shared with the live stats, so it can be serialized
+        off the loop while the crawl goes on.
+        """
+        return {
+            'start_time': self.start_time.isoformat(),
+            'pages_crawled': self.pages_crawled,
+            'pdfs_found': self.pdfs_found,
+            'pdfs_downloaded': self.pdfs_downloaded,
+            'duplicates_skipped': self.duplicates_skipped,
+            'unchanged_skipped': self.unchanged_skipped,
+            'near_duplicates_skipped': self.near_duplicates_skipped,
+            'errors': self.errors.state_dict(),
+            'pdf_checksum_store': self.pdf_checksums.kind,
+            'pdf_checksums': self.pdf_checksums.snapshot(),
+            'site_pages': dict(self.site_pages),
+            'metrics': self.metrics.state_dict()
+        }
+    
+    def load_state(self, state: Dict):
+        """Restore counters saved by state_dict()"""
+        self.start_time = datetime.fromisoformat(state['start_time'])
+        self.pages_crawled = state['pages_crawled']
+        self.pdfs_found = state['pdfs_found']
+        self.pdfs_downloaded = state['pdfs_downloaded']
+        self.duplicates_skipped = state['duplicates_skipped']
+        self.unchanged_skipped = state['unchanged_skipped']
+        self.near_duplicates_skipped = state.get('near_duplicates_skipped', 0)
+        self.errors.load_state(state['errors'])
+        restore_seen_store(self.pdf_checksums, state['pdf_checksums'], state.get('pdf_checksum_store', 'set'))
+        self.site_pages = dict(state.get('site_pages', {}))
+        self.metrics.load_state(state.get('metrics', {}))
+    
+    def to_dict(self, top_errors: int = 20) -> Dict:
+        """Convert stats to dictionary for reporting; errors are summarized into the top_errors groups"""
+        # Settle times are kept only as the 'settle' stage histogram, not per URL
+        settle = self.metrics.stages.get('settle')
+        seen_stores = self.seen_store_usage()
+        duration_minutes = (datetime.now() - self.start_time).total_seconds() / 60
+        processed = self.pages_crawled + self.pdfs_downloaded
         return {
             'start_time': self.start_time.isoformat(),
             'end_time': datetime.now().isoformat(),
-            'duration_minutes': (datetime.now() - self.start_time).total_seconds() / 60,
+            'duration_minutes': duration_minutes,
             'pages_crawled': self.pages_crawled,
             'pdfs_found': self.pdfs_found,
             'pdfs_downloaded': self.pdfs_downloaded,
             'duplicates_skipped': self.duplicates_skipped,
+            'unchanged_skipped': self.unchanged_skipped,
+            'near_duplicates_skipped': self.near_duplicates_skipped,
+            'avg_settle_seconds': settle.total / settle.count if settle and settle.count else 0.0,
+            'max_settle_seconds': settle.max if settle else 0.0,
+            'site_pages': dict(self.site_pages),
+            'pages_per_minute': processed / duration_minutes if duration_minutes else 0.0,
+            'bytes_downloaded': self.metrics.bytes.get('downloaded', 0),
+            'bytes_written': self.metrics.bytes.get('written', 0),
+            'stage_timings': self.metrics.summary(),
+            'seen_stores': seen_stores,
+            'seen_store_bytes': sum(usage['memory_bytes'] for usage in seen_stores.values()),
             'errors_count': len(self.errors),
-            'errors': self.errors
-        }
\ No newline at end of file
+            'errors_file': str(self.errors.path) if self.errors.path else None,
+            'errors_by_class': self.errors.by_class(),
+            'errors_by_host': self.errors.by_host(),
+            'top_errors': self.errors.top(top_errors)
+        }
+
+
+class SiteStats:
+    """Per-site view of a shared CrawlStats that also enforces a site page budget"""
+    
+    def __init__(self, parent: CrawlStats, base_url: str, max_pages: Optional[int]):
+        self.parent = parent
+        self.base_url = base_url
+        self.max_pages = max_pages
+        self.reserved = 0
+        parent.site_pages.setdefault(base_url, 0)
+    
+    def __getattr__(self, name):
+        # Everything not overridden here is shared with the whole run
+        return getattr(self.parent, name)
+    
+    @property
+    def pages_processed(self) -> int:
+        return self.parent.site_pages[self.base_url]
+    
+    def record_html_page(self):
+        """Record a converted HTML page against this site and the run"""
+        self.parent.site_pages[self.base_url] += 1
+        self.parent.record_html_page()
+    
+    def record_pdf_download(self):
+        """Record a downloaded PDF against this site and the run"""
+        self.parent.site_pages[self.base_url] += 1
+        self.parent.record_pdf_download()
+    
+    def has_reached_limit(self) -> bool:
+        """Check the site budget and the run-wide MAX_PAGES limit"""
+        if self.max_pages and self.pages_processed >= self.max_pages:
+            return True
+        return self.parent.has_reached_limit()
+    
+    def reserve_page(self) -> bool:
+        """Claim a slot in both the site budget and MAX_PAGES"""
+        if self.max_pages and self.pages_processed + self.reserved >= self.max_pages:
+            return False
+        if not self.parent.reserve_page():
+            return False
+        self.reserved += 1
+        return True
+    
+    def release_page(self):
+        """Give back a slot claimed by reserve_page()"""
+        self.reserved -= 1
+        self.parent.release_page()
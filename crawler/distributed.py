@@ -0,0 +1,291 @@
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from crawler.checkpoint import CrawlCheckpoint
+from crawler.config import config
+from crawler.crawl_stats import CrawlStats, SiteStats
+from crawler.error_log import ErrorLog
+from crawler.frontier import UrlScorer
+from crawler.seen_store import FingerprintSet
+from crawler.web_crawler import Site, WebCrawler
+from crawler.work_queue import Lease, QueuedUrl, SharedChecksums, SQLiteWorkQueue, open_work_queue
+from utils.url_utils import canonicalize_url, get_base_domain, url_key
+
+logger = logging.getLogger(__name__)
+
+APP_PATH = Path(__file__).resolve().parent.parent / 'app.py'
+# Seconds between recounts of the live workers that split the per-host limits
+WORKER_COUNT_INTERVAL = 5.0
+
+class QueueFrontier:
+    """Frontier stand-in that collects the URLs added to it for the shared work queue
+
+    Stands in for Frontier where WebCrawler adds links or sitemap URLs;
+    whether a URL is new is decided by the queue when take() is written.
+    """
+
+    def __init__(self, site: str, scorer: UrlScorer):
+        self.site = site
+        self.scorer = scorer
+        self.urls: List[QueuedUrl] = []
+        self.keys: Set[str] = set()
+
+    def add(self, url: str, depth: int, lastmod: Optional[datetime] = None) -> bool:
+        """Collect a canonical URL; False if it was already collected here"""
+        key = url_key(url)
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        self.urls.append(QueuedUrl(key, url, self.site, depth, self.scorer(url, depth, 0, lastmod),
+                                   lastmod.isoformat() if lastmod is not None else None))
+        return True
+
+    def take(self) -> List[QueuedUrl]:
+        """Hand over the collected URLs"""
+        urls, self.urls = self.urls, []
+        return urls
+
+
+class LeaseStats(SiteStats):
+    """SiteStats for one leased URL that notes whether it was archived
+
+    Budgets are enforced by the queue when it hands out leases, so no
+    site budget is checked here.
+    """
+
+    def __init__(self, parent: CrawlStats, base_url: str):
+        super().__init__(parent, base_url, None)
+        self.counted = False
+
+    def record_html_page(self):
+        self.counted = True
+        super().record_html_page()
+
+    def record_pdf_download(self):
+        self.counted = True
+        super().record_pdf_download()
+
+
+def new_work_queue(run_id: str) -> SQLiteWorkQueue:
+    """Open the WORK_QUEUE_BACKEND queue of a distributed run"""
+    return open_work_queue(config.WORK_QUEUE_BACKEND, config.QUEUE_DIR, run_id,
+                           inlink_weight=config.PRIORITY_INLINK_WEIGHT, max_attempts=config.LEASE_MAX_ATTEMPTS)
+
+
+class CrawlWorker:
+    """One `app.py worker` process: leases URLs from a run's work queue and crawls them
+
+    Up to CRAWL_WORKERS leased URLs are processed at once by WebCrawler's
+    usual per-URL path; their links go back to the queue when each URL is
+    completed. Each worker keeps to 1/N of the per-host politeness limits
+    (DELAY_BETWEEN_REQUESTS or Crawl-delay, HOST_BURST, HOST_MAX_CONCURRENCY),
+    N being the live workers counted at every heartbeat.
+    """
+
+    def __init__(self, run_id: str, worker_id: Optional[str] = None):
+        self.run_id = run_id
+        # The pid keeps a restarted worker from overwriting the stats its predecessor reported
+        self.worker_id = f"{worker_id or socket.gethostname()}-{os.getpid()}"
+        self.queue = new_work_queue(run_id)
+        # Queue and content index calls may wait for write locks, so they run off the event loop, one at a time
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.crawler = WebCrawler()
+        self.sites: Dict[str, tuple] = {}
+        self.unchanged: Dict[str, FingerprintSet] = {}
+
+    async def db(self, method, *args):
+        """Run a queue method on the queue thread"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, method, *args)
+
+    async def process(self, lease: Lease, stats: CrawlStats, session):
+        """Crawl one leased URL and report it to the queue"""
+        base_domain, _, max_depth = self.sites[lease.site]
+        site = Site(
+            base_url=lease.site,
+            base_domain=base_domain,
+            max_depth=max_depth,
+            frontier=QueueFrontier(lease.site, self.crawler.scorer),
+            stats=LeaseStats(stats, lease.site),
+            unchanged=self.unchanged.setdefault(lease.site, FingerprintSet())
+        )
+        if lease.lastmod is not None:
+            previous = await self.crawler.content_index.get_async(lease.url)
+            if previous is not None and previous.unchanged_since(datetime.fromisoformat(lease.lastmod)):
+                site.unchanged.add(lease.key)
+        try:
+            await self.crawler.process_url(lease.url, lease.depth, site, session)
+        except Exception:
+            await self.db(self.queue.release, self.worker_id, lease)
+            raise
+        # A cancelled URL is neither completed nor released here; run()'s final heartbeat expires its lease
+        await self.db(self.queue.complete, self.worker_id, lease, site.stats.counted, site.frontier.take())
+
+    async def run(self) -> CrawlStats:
+        """Work until the run has nothing left to lease"""
+        if self.queue.meta('run_id') is None:
+            raise ValueError(f"No distributed run {self.run_id} in {config.QUEUE_DIR}")
+        crawler = self.crawler
+        stats = CrawlStats(
+            int(self.queue.meta('max_pages')),
+            SharedChecksums(self.queue.path),
+            crawler.metrics,
+            ErrorLog(config.LOGS_DIR / f"errors_{self.run_id}_{self.worker_id}.jsonl", sample_size=config.ERROR_SAMPLES)
+        )
+        self.sites = self.queue.sites()
+        crawler.pdf_converter.checksum_executor = self.executor
+        crawler.content_index.executor = self.executor
+        crawler.pdf_converter.pdf_store.begin_run(self.run_id)
+        session = crawler.http_client.session
+        logger.info(f"Worker {self.worker_id} joined run {self.run_id}")
+
+        tasks: Set[asyncio.Task] = set()
+        last_heartbeat = last_count = 0.0
+        try:
+            while True:
+                if time.monotonic() - last_heartbeat > config.LEASE_SECONDS / 3:
+                    await self.db(self.queue.heartbeat, self.worker_id, config.LEASE_SECONDS, stats.state_dict())
+                    last_heartbeat = time.monotonic()
+                if time.monotonic() - last_count > WORKER_COUNT_INTERVAL:
+                    crawler.host_scheduler.set_share(await self.db(self.queue.active_workers, config.LEASE_SECONDS))
+                    last_count = time.monotonic()
+
+                free = config.CRAWL_WORKERS - len(tasks)
+                leases = await self.db(self.queue.lease, self.worker_id, free, config.LEASE_SECONDS) if free > 0 else []
+                for lease in leases:
+                    tasks.add(asyncio.create_task(self.process(lease, stats, session)))
+
+                if not tasks:
+                    if await self.db(self.queue.finished):
+                        break
+                    await asyncio.sleep(config.QUEUE_POLL_INTERVAL)
+                    continue
+                done, tasks = await asyncio.wait(tasks, timeout=config.QUEUE_POLL_INTERVAL,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Unfinished leases expire and go to other workers
+            await self.db(self.queue.heartbeat, self.worker_id, 0, stats.state_dict(), True)
+            crawler.pdf_converter.cleanup()
+            crawler.content_index.close()
+            await crawler.http_client.close()
+            stats.pdf_checksums.close()
+            stats.errors.close()
+            self.executor.shutdown()
+            self.queue.close()
+
+        logger.info(f"Worker {self.worker_id} done: {stats.total_processed()} pages and PDFs archived")
+        return stats
+
+
+class CrawlCoordinator:
+    """`cli.py crawl --distributed`: owns a run's work queue until workers have drained it
+
+    Seeds the queue with BASE_URLS and their sitemaps, optionally starts
+    local worker processes, waits until no URL is queued or leased, then
+    merges the stats every worker reported.
+    """
+
+    def __init__(self, run_id: Optional[str] = None):
+        self.resuming = run_id is not None
+        self.run_id = run_id or CrawlCheckpoint.new(config.QUEUE_DIR).run_id
+        self.queue = new_work_queue(self.run_id)
+        self.crawler = WebCrawler()
+
+    def start_workers(self, count: int) -> List[subprocess.Popen]:
+        """Start worker processes on this machine"""
+        return [
+            subprocess.Popen([sys.executable, str(APP_PATH), 'worker', '--run-id', self.run_id,
+                              '--worker-id', f"{socket.gethostname()}-local{index}"])
+            for index in range(count)
+        ]
+
+    async def seed(self, session):
+        """Queue the base URLs, then the URLs of their sitemaps"""
+        crawler = self.crawler
+        frontiers = {}
+        for base_url in config.BASE_URLS:
+            frontiers[base_url] = QueueFrontier(base_url, crawler.scorer)
+            frontiers[base_url].add(canonicalize_url(base_url, config.STRIP_QUERY_PARAMS), 0)
+            self.queue.add(frontiers[base_url].take())
+
+        if config.SITEMAP_DISCOVERY:
+            sites = [
+                Site(base_url, get_base_domain(base_url), config.site_budget(base_url)[1],
+                     frontiers[base_url], None, FingerprintSet())
+                for base_url in config.BASE_URLS
+            ]
+            await asyncio.gather(*(crawler.seed_from_sitemaps(site, session) for site in sites))
+            for frontier in frontiers.values():
+                self.queue.add(frontier.take())
+        self.queue.set_meta('seeding', '0')
+
+    async def run(self, local_workers: int = 0) -> CrawlStats:
+        """Seed (unless resuming a seeded run), wait for the workers, and return the merged stats"""
+        queue = self.queue
+        if self.resuming:
+            if queue.meta('run_id') is None:
+                raise ValueError(f"No distributed run {self.run_id} in {config.QUEUE_DIR}")
+            logger.info(f"Resuming distributed crawl run {self.run_id}")
+        else:
+            queue.setup(self.run_id, config.MAX_PAGES, [
+                (base_url, get_base_domain(base_url), *config.site_budget(base_url))
+                for base_url in config.BASE_URLS
+            ])
+            logger.info(f"Starting distributed crawl run {self.run_id} in {queue.path}")
+
+        workers = self.start_workers(local_workers)
+        session = self.crawler.http_client.session
+        try:
+            if queue.meta('seeding') == '1':
+                await self.seed(session)
+            while not queue.finished():
+                counts = queue.counts()
+                logger.info(f"Run {self.run_id}: {counts.get('queued', 0)} queued, {counts.get('leased', 0)} leased, "
+                            f"{counts.get('done', 0)} done, {queue.meta('pages')} archived")
+                await asyncio.sleep(config.QUEUE_POLL_INTERVAL * 5)
+            queue.set_meta('finished', '1')
+        except BaseException:
+            # Local workers would otherwise wait for seeding that never ends
+            for worker in workers:
+                worker.terminate()
+            raise
+        finally:
+            await self.crawler.http_client.close()
+            self.crawler.pdf_converter.cleanup()
+            self.crawler.content_index.close()
+            loop = asyncio.get_running_loop()
+            for worker in workers:
+                await loop.run_in_executor(None, worker.wait)
+
+        # Workers on other machines send their final stats once they see the run is over
+        while queue.active_workers(config.LEASE_SECONDS):
+            await asyncio.sleep(config.QUEUE_POLL_INTERVAL)
+        stats = CrawlStats(int(queue.meta('max_pages')), errors=ErrorLog(
+            config.LOGS_DIR / f"errors_{self.run_id}.jsonl", sample_size=config.ERROR_SAMPLES))
+        stats.start_time = datetime.fromisoformat(queue.meta('started_at'))
+        worker_stats = queue.worker_stats()
+        for state in worker_stats.values():
+            stats.merge(state)
+        # One spool for the report's error pages
+        for spool in sorted(config.LOGS_DIR.glob(f"errors_{self.run_id}_*.jsonl")):
+            with open(spool, encoding='utf-8') as f:
+                shutil.copyfileobj(f, stats.errors.spool)
+            spool.unlink()
+        stats.errors.close()
+        queue.close()
+        logger.info(f"Distributed crawl run {self.run_id} completed by {len(worker_stats)} workers")
+        return stats
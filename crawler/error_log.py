@@ -0,0 +1,132 @@
+import json
+import logging
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Past this many (class, host) groups new classes are counted as OTHER_CLASS
+MAX_GROUPS = 1000
+OTHER_CLASS = '(other)'
+VARIABLE_PARTS = re.compile(r"https?://\S+|'[^']*'|\"[^\"]*\"|0x[0-9a-f]+|(?<!HTTP )\b\d+(\.\d+)?\b", re.IGNORECASE)
+
+def error_class(error: str) -> str:
+    """Group key for an error message: URLs, quoted values and numbers (but HTTP statuses) blanked out"""
+    return VARIABLE_PARTS.sub('…', error)[:160]
+
+def error_host(url: str) -> str:
+    return urlparse(url).netloc.lower() or url
+
+
+class ErrorLog:
+    """Crawl errors spooled to an append-only JSONL file, counted by class and host
+
+    Memory stays bounded: only the counts per (class, host) and the first
+    sample_size errors of each group are kept; the full list is in the file.
+    """
+
+    def __init__(self, path: Optional[Path] = None, sample_size: int = 5):
+        self.path = path
+        self.sample_size = sample_size
+        self.count = 0
+        self.groups: Counter = Counter()  # (class, host) -> count
+        self.samples: Dict[Tuple[str, str], List[dict]] = {}
+        self.spool = open(path, 'a', encoding='utf-8', buffering=1) if path is not None else None
+        self.lock = threading.Lock()
+
+    def add(self, url: str, error: str, timestamp: Optional[str] = None):
+        """Record one error"""
+        entry = {'url': url, 'error': error, 'timestamp': timestamp or datetime.now().isoformat()}
+        key = (error_class(error), error_host(url))
+        with self.lock:
+            if key not in self.groups and len(self.groups) >= MAX_GROUPS:
+                key = (OTHER_CLASS, key[1])
+            self.count += 1
+            self.groups[key] += 1
+            samples = self.samples.setdefault(key, [])
+            if len(samples) < self.sample_size:
+                samples.append(entry)
+            if self.spool is not None:
+                self.spool.write(json.dumps(entry) + '\n')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def by_class(self) -> Dict[str, int]:
+        totals = Counter()
+        for (cls, _), count in self.groups.items():
+            totals[cls] += count
+        return dict(totals.most_common())
+
+    def by_host(self) -> Dict[str, int]:
+        totals = Counter()
+        for (_, host), count in self.groups.items():
+            totals[host] += count
+        return dict(totals.most_common())
+
+    def top(self, n: int) -> List[Dict]:
+        """The n largest (class, host) groups with their sample errors"""
+        return [
+            {'error_class': cls, 'host': host, 'count': count, 'samples': self.samples.get((cls, host), [])}
+            for (cls, host), count in self.groups.most_common(n)
+        ]
+
+    def iter_errors(self) -> Iterator[dict]:
+        """Stream every spooled error from disk, in the order recorded"""
+        if self.path is None:
+            # Nothing spooled: the samples are all there is
+            for samples in self.samples.values():
+                yield from samples
+            return
+        yield from self.read(self.path)
+
+    @staticmethod
+    def read(path: Path) -> Iterator[dict]:
+        """Stream the errors in a spool file"""
+        if not Path(path).exists():
+            return
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash
+                    continue
+
+    def state_dict(self) -> Dict:
+        """Counts and samples; the spooled lines are already on disk"""
+        return {
+            'count': self.count,
+            'groups': [[cls, host, count, list(self.samples.get((cls, host), []))]
+                       for (cls, host), count in self.groups.items()]
+        }
+
+    def merge(self, state: Dict):
+        """Add the counts and samples of another log's state_dict()"""
+        with self.lock:
+            self.count += state.get('count', 0)
+            for cls, host, count, samples in state.get('groups', []):
+                self.groups[(cls, host)] += count
+                mine = self.samples.setdefault((cls, host), [])
+                mine.extend(samples[:self.sample_size - len(mine)])
+
+    def load_state(self, state):
+        """Restore a state_dict(), or replay a plain error list from older checkpoints"""
+        if isinstance(state, list):
+            for entry in state:
+                self.add(entry['url'], entry['error'], entry.get('timestamp'))
+            return
+        self.count = 0
+        self.groups.clear()
+        self.samples.clear()
+        self.merge(state)
+
+    def close(self):
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
@@ -0,0 +1,146 @@
+import asyncio
+import heapq
+import itertools
+import math
+from datetime import datetime, timezone
+from fnmatch import fnmatchcase
+from typing import Callable, Dict, List, Optional, Tuple
+from crawler.seen_store import ExactSeenStore, restore_seen_store
+from utils.url_utils import is_pdf_url, url_key
+
+# Days for a <lastmod> freshness bonus to halve
+FRESHNESS_HALF_LIFE_DAYS = 30.0
+
+class UrlScorer:
+    """Score candidate URLs; the frontier hands out the highest score first
+
+    score = - depth_weight * depth
+            + pdf_weight if the URL is likely a PDF
+            + inlink_weight * log2(1 + links to it found so far)
+            + freshness_weight * 0.5 ** (days since its sitemap <lastmod> / 30)
+            + the weight of every rule whose glob matches the URL
+    """
+
+    def __init__(self, depth_weight: float = 1.0, pdf_weight: float = 0.0, inlink_weight: float = 0.0,
+                 freshness_weight: float = 0.0, rules: Optional[Dict[str, float]] = None,
+                 pdf_likely: Optional[Callable[[str], bool]] = None):
+        self.depth_weight = depth_weight
+        self.pdf_weight = pdf_weight
+        self.inlink_weight = inlink_weight
+        self.freshness_weight = freshness_weight
+        self.rules = [(pattern.lower(), weight) for pattern, weight in (rules or {}).items()]
+        self.pdf_likely = pdf_likely or is_pdf_url
+
+    def inlink_bonus(self, inlinks: int) -> float:
+        """The in-link part of the score"""
+        return self.inlink_weight * math.log2(1 + inlinks) if self.inlink_weight and inlinks else 0.0
+
+    def __call__(self, url: str, depth: int, inlinks: int = 0, lastmod: Optional[datetime] = None) -> float:
+        score = -self.depth_weight * depth
+        if self.pdf_weight and self.pdf_likely(url):
+            score += self.pdf_weight
+        score += self.inlink_bonus(inlinks)
+        if self.freshness_weight and lastmod is not None:
+            age_days = max(0.0, (datetime.now(timezone.utc) - lastmod).total_seconds() / 86400)
+            score += self.freshness_weight * 0.5 ** (age_days / FRESHNESS_HALF_LIFE_DAYS)
+        if self.rules:
+            lowered = url.lower()
+            score += sum(weight for pattern, weight in self.rules if fnmatchcase(lowered, pattern))
+        return score
+
+
+class Frontier:
+    """Queue of (url, depth) items waiting to be crawled, best score first
+
+    Without a scorer every URL scores 0 and items come out in the order
+    they were added. A link to a URL that is still queued raises its
+    in-link count, and so its score; the old heap entry is then skipped.
+    """
+
+    def __init__(self, seen=None, scorer: Optional[UrlScorer] = None):
+        self.scorer = scorer
+        self.heap: List[Tuple[float, int, str]] = []  # (-score, order added, url_key)
+        self.order = itertools.count()
+        # url_key -> [score, url, depth, lastmod, inlinks] of items still in the heap
+        self.queued: Dict[str, List] = {}
+        # url_key() of every URL ever queued, in any crawler.seen_store store
+        self.seen = seen if seen is not None else ExactSeenStore()
+        self.pending: Dict[str, int] = {}  # queued or in progress, for checkpoints
+        self.unfinished = 0
+        self.not_empty = asyncio.Event()
+        self.finished = asyncio.Event()
+        self.finished.set()
+
+    def _score(self, url: str, depth: int, inlinks: int, lastmod: Optional[datetime]) -> float:
+        return self.scorer(url, depth, inlinks, lastmod) if self.scorer is not None else 0.0
+
+    def _push(self, key: str, item: List):
+        self.queued[key] = item
+        heapq.heappush(self.heap, (-item[0], next(self.order), key))
+        self.not_empty.set()
+
+    def add(self, url: str, depth: int, lastmod: Optional[datetime] = None) -> bool:
+        """Queue a canonical URL unless an equivalent one has already been seen
+
+        lastmod is the URL's sitemap <lastmod>, if it came from one.
+        """
+        key = url_key(url)
+        if not self.seen.add(key):
+            item = self.queued.get(key)
+            if item is not None and self.scorer is not None and self.scorer.inlink_weight:
+                item[4] += 1
+                self._push(key, [self._score(item[1], item[2], item[4], item[3])] + item[1:])
+            return False
+
+        self.pending[url] = depth
+        self.unfinished += 1
+        self.finished.clear()
+        self._push(key, [self._score(url, depth, 1, lastmod), url, depth, lastmod, 1])
+        return True
+
+    async def get(self) -> Tuple[str, int]:
+        """Wait for the queued (url, depth) item with the best score"""
+        while True:
+            while self.heap:
+                negative_score, _, key = heapq.heappop(self.heap)
+                item = self.queued.get(key)
+                # Entries left behind by a score change are skipped
+                if item is not None and item[0] == -negative_score:
+                    del self.queued[key]
+                    return item[1], item[2]
+            self.not_empty.clear()
+            await self.not_empty.wait()
+
+    def task_done(self, url: str):
+        """Mark an item returned by get() as processed"""
+        self.pending.pop(url, None)
+        self.unfinished -= 1
+        if self.unfinished == 0:
+            self.finished.set()
+
+    async def join(self):
+        """Wait until every queued item has been processed"""
+        await self.finished.wait()
+
+    def snapshot(self) -> Dict[str, List]:
+        """Get the unfinished items and seen URLs as JSON-friendly data"""
+        return {
+            'pending': [[url, depth] for url, depth in self.pending.items()],
+            'seen_store': self.seen.kind,
+            'seen': self.seen.snapshot()
+        }
+
+    @classmethod
+    def restore(cls, snapshot: Dict[str, List], seen=None, scorer: Optional[UrlScorer] = None) -> 'Frontier':
+        """Rebuild a frontier from snapshot(); unfinished items are queued again"""
+        frontier = cls(seen, scorer)
+        restore_seen_store(frontier.seen, snapshot['seen'], snapshot.get('seen_store', 'set'))
+        for url, depth in snapshot['pending']:
+            frontier.pending[url] = depth
+            frontier.unfinished += 1
+            frontier.finished.clear()
+            frontier._push(url_key(url), [frontier._score(url, depth, 1, None), url, depth, None, 1])
+        return frontier
+
+    def __len__(self) -> int:
+        return len(self.queued)
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_STATUSES = {429, 503}
+
+class HostSlot:
+    """One request's hold on a host, used to report how it went"""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.status: Optional[int] = None
+        self.latency: Optional[float] = None
+        self.retry_after: Optional[float] = None
+
+    def record(self, response: aiohttp.ClientResponse):
+        """Record the response status and time to first byte"""
+        self.status = response.status
+        self.latency = time.monotonic() - self.start
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            self.retry_after = float(retry_after)
+
+
+class HostState:
+    """Token bucket and AIMD concurrency window for a single host"""
+
+    def __init__(self, host: str, min_interval: float, burst: int, max_concurrency: int):
+        self.host = host
+        self.base_rate = 1 / min_interval if min_interval > 0 else None
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.rate_factor = 1.0
+        self.window = 1.0
+        self.active = 0
+        self.paused_until = 0.0
+        self.failures = 0
+        self.robots: Optional[RobotFileParser] = None
+        self.changed = asyncio.Condition()
+        # Processes crawling this host with their own HostState; each takes its share of the limits
+        self.share = 1
+
+    def _rate(self) -> float:
+        return self.base_rate * self.rate_factor / self.share
+
+    def _refill(self, now: float):
+        if self.base_rate is not None:
+            self.tokens = min(max(1.0, self.burst / self.share), self.tokens + (now - self.last_refill) * self._rate())
+        self.last_refill = now
+
+    async def acquire(self):
+        """Wait for a free concurrency slot and a rate token"""
+        while True:
+            now = time.monotonic()
+            wait = None
+            if now < self.paused_until:
+                wait = self.paused_until - now
+            elif self.active < min(int(self.window), max(1, self.max_concurrency // self.share)):
+                if self.base_rate is None:
+                    self.active += 1
+                    return
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.active += 1
+                    return
+                wait = (1 - self.tokens) / self._rate()
+
+            # Wake up on a release or when the next token is due
+            async with self.changed:
+                try:
+                    await asyncio.wait_for(self.changed.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, slot: HostSlot, failed: bool, slow_threshold: float):
+        """Free the slot and adapt the window to how the request went"""
+        self.active -= 1
+        overloaded = failed or slot.status in BACKOFF_STATUSES
+        slow = slot.latency is not None and slot.latency > slow_threshold
+
+        if overloaded or slow:
+            # Multiplicative decrease
+            self.window = max(1.0, self.window / 2)
+            self.rate_factor = max(0.125, self.rate_factor / 2)
+            if overloaded:
+                self.failures += 1
+                pause = slot.retry_after if slot.retry_after is not None else min(60.0, 5.0 * self.failures)
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+                logger.info(f"Backing off {self.host} for {pause:.1f}s (window {self.window:.1f})")
+        elif slot.status is not None and slot.status < 500:
+            # Additive increase, roughly one slot per window of healthy responses
+            self.failures = 0
+            self.window = min(self.max_concurrency, self.window + 1 / self.window)
+            self.rate_factor = min(1.0, self.rate_factor + 0.1)
+
+        async with self.changed:
+            self.changed.notify_all()
+
+
+class HostScheduler:
+    """Per-host politeness: token bucket, robots.txt rules and adaptive concurrency
+
+    robots.txt is read when respect_robots is set (its Crawl-delay and
+    Disallow rules then apply) or when read_robots asks for its Sitemap: lines.
+    When set_share() says N processes crawl at once, each keeps to 1/N of
+    every host's limits.
+    """
+
+    def __init__(self, delay: float, burst: int, max_concurrency: int, slow_threshold: float, respect_robots: bool,
+                 read_robots: bool = False):
+        self.delay = delay
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.slow_threshold = slow_threshold
+        self.respect_robots = respect_robots
+        self.read_robots = respect_robots or read_robots
+        self.hosts: Dict[str, HostState] = {}
+        self.host_locks: Dict[str, asyncio.Lock] = {}
+        self.share = 1
+
+    def set_share(self, share: int):
+        """Split every host's rate, burst and concurrency with share - 1 other crawler processes"""
+        self.share = max(1, share)
+        for state in self.hosts.values():
+            state.share = self.share
+
+    async def _fetch_robots(self, origin: str, session: aiohttp.ClientSession) -> RobotFileParser:
+        robots = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            async with session.get(robots.url) as response:
+                if response.status == 200:
+                    robots.parse((await response.text()).splitlines())
+                elif response.status in (401, 403):
+                    robots.disallow_all = True
+                else:
+                    robots.allow_all = True
+        except Exception as e:
+            logger.warning(f"Could not fetch {robots.url}: {e}")
+            robots.allow_all = True
+        return robots
+
+    async def get_host(self, url: str, session: aiohttp.ClientSession) -> HostState:
+        """Get the state for a URL's host, reading robots.txt the first time"""
+        parsed = urlparse(url)
+        host = parsed.netloc.lower()
+        if host in self.hosts:
+            return self.hosts[host]
+
+        async with self.host_locks.setdefault(host, asyncio.Lock()):
+            if host not in self.hosts:
+                robots = None
+                min_interval = self.delay
+                if self.read_robots:
+                    robots = await self._fetch_robots(f"{parsed.scheme}://{parsed.netloc}", session)
+                    crawl_delay = robots.crawl_delay('*') if self.respect_robots else None
+                    if crawl_delay:
+                        min_interval = max(min_interval, float(crawl_delay))
+                        logger.info(f"Using robots.txt Crawl-delay of {crawl_delay}s for {host}")
+
+                state = HostState(host, min_interval, self.burst, self.max_concurrency)
+                state.share = self.share
+                state.robots = robots
+                self.hosts[host] = state
+        return self.hosts[host]
+
+    async def allowed(self, url: str, session: aiohttp.ClientSession) -> bool:
+        """Check robots.txt lets the crawler fetch a URL; always True unless respect_robots"""
+        if not self.respect_robots:
+            return True
+        robots = (await self.get_host(url, session)).robots
+        return robots.can_fetch('*', url)
+
+    async def sitemaps(self, url: str, session: aiohttp.ClientSession) -> List[str]:
+        """Get the Sitemap: URLs of the robots.txt of a URL's host"""
+        robots = (await self.get_host(url, session)).robots
+        return (robots.site_maps() or []) if robots is not None else []
+
+    @asynccontextmanager
+    async def slot(self, url: str, session: aiohttp.ClientSession):
+        """Hold a request slot on the URL's host; call slot.record(response) inside"""
+        state = await self.get_host(url, session)
+        await state.acquire()
+        slot = HostSlot()
+        failed = False
+        try:
+            yield slot
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            failed = True
+            raise
+        finally:
+            await state.release(slot, failed, self.slow_threshold)
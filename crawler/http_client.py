@@ -0,0 +1,68 @@
+import logging
+import ssl
+from functools import lru_cache
+from typing import List, Optional
+import aiohttp
+import certifi
+
+try:
+    import brotli  # noqa: F401 - aiohttp decodes br bodies when this is importable
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def shared_ssl_context() -> ssl.SSLContext:
+    """SSL context with certifi certificates, built once per process"""
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+class HttpClient:
+    """One connection pool, DNS cache and SSL context shared by a whole crawl
+
+    Pass an existing ClientSession to reuse it instead (e.g. one pointed at a
+    local test server); an injected session is left open on close().
+    """
+
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None, limit: int = 100,
+                 limit_per_host: int = 0, dns_cache_ttl: int = 300, keepalive_timeout: float = 30,
+                 timeout: float = 30, trace_configs: Optional[List[aiohttp.TraceConfig]] = None):
+        self.injected = session is not None
+        self._session = session
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.trace_configs = trace_configs or []
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session, created on first use inside the running loop"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+                ssl=shared_ssl_context()
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'Accept-Encoding': ACCEPT_ENCODING},
+                auto_decompress=True,
+                trace_configs=self.trace_configs
+            )
+            logger.info(f"HTTP client started (limit={self.limit}, per host={self.limit_per_host}, "
+                        f"DNS TTL={self.dns_cache_ttl}s, Accept-Encoding: {ACCEPT_ENCODING})")
+        return self._session
+
+    async def close(self):
+        """Close the session unless it was injected"""
+        if self._session is not None and not self.injected:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,94 @@
+import codecs
+import re
+from typing import List, Optional
+from urllib.parse import urljoin
+from lxml import etree
+
+HTML_CONTENT_TYPES = {'text/html', 'application/xhtml+xml'}
+# Boilerplate left out of the main text used for near-duplicate detection
+NON_CONTENT_TAGS = {'script', 'style', 'noscript', 'template', 'nav', 'header', 'footer', 'aside', 'form'}
+BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+# Browsers look for <meta charset> or <meta http-equiv content="...; charset="> in the first 1024 bytes
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+META_SNIFF_BYTES = 1024
+# Labels browsers decode as windows-1252, which is a superset of them
+WINDOWS_1252_LABELS = {'iso-8859-1', 'latin-1', 'latin1', 'l1', 'ascii', 'us-ascii', 'iso8859-1'}
+
+def html_encoding(body: bytes, declared: Optional[str] = None) -> str:
+    """Encoding to decode an HTML body with: BOM, then the Content-Type charset, then <meta>, then UTF-8"""
+    for bom, encoding in BOMS:
+        if body.startswith(bom):
+            return encoding
+    labels = [declared] if declared else []
+    match = META_CHARSET_RE.search(body[:META_SNIFF_BYTES])
+    if match:
+        labels.append(match.group(1).decode('ascii', errors='ignore'))
+    for label in labels:
+        label = label.strip().lower()
+        if label in WINDOWS_1252_LABELS:
+            return 'cp1252'
+        try:
+            return codecs.lookup(label).name
+        except LookupError:
+            continue
+    return 'utf-8'
+
+
+class LinkExtractor:
+    """Collect <a href> links and main text from HTML fed in chunks, without building a tree"""
+
+    def __init__(self, url: str, encoding: Optional[str] = None):
+        self.url = url
+        self.base_url = url
+        self.hrefs: List[str] = []
+        self.seen_base = False
+        self.text_parts: List[str] = []
+        self.skip_depth = 0  # open NON_CONTENT_TAGS elements
+        # lxml calls start()/end()/data()/close() on this object as it parses
+        self.parser = etree.HTMLParser(target=self, encoding=encoding)
+
+    @staticmethod
+    def is_html(content_type: str) -> bool:
+        """Check whether a Content-Type is worth parsing for links"""
+        return content_type.split(';')[0].strip().lower() in HTML_CONTENT_TYPES
+
+    def feed(self, chunk: bytes):
+        """Parse the next chunk of the body"""
+        self.parser.feed(chunk)
+
+    def links(self) -> List[str]:
+        """Finish parsing and return absolute link URLs, honouring <base href>"""
+        try:
+            self.parser.close()
+        except etree.XMLSyntaxError:
+            # Empty or truncated bodies still yield whatever was parsed
+            pass
+        return [urljoin(self.base_url, href) for href in self.hrefs]
+
+    def text(self) -> str:
+        """Visible text outside scripts, navigation, headers and footers; call after links()"""
+        return ' '.join(self.text_parts)
+
+    # Parser target interface
+
+    def start(self, tag, attrib):
+        if tag in NON_CONTENT_TAGS:
+            self.skip_depth += 1
+        if tag == 'a':
+            href = attrib.get('href')
+            if href:
+                self.hrefs.append(href.strip())
+        elif tag == 'base' and not self.seen_base and attrib.get('href'):
+            self.seen_base = True
+            self.base_url = urljoin(self.url, attrib['href'].strip())
+
+    def end(self, tag):
+        if tag in NON_CONTENT_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def data(self, data):
+        if not self.skip_depth and not data.isspace():
+            self.text_parts.append(data.strip())
+
+    def close(self):
+        return None
@@ -0,0 +1,142 @@
+import bisect
+import math
+import time
+from contextlib import contextmanager
+from typing import Dict
+import aiohttp
+
+# Bucket upper bounds grow by 10% from 0.5 ms to ~20 minutes, so percentiles
+# read off the histogram are within 10% of the true value
+BUCKET_BOUNDS = [0.0005 * 1.1 ** i for i in range(155)]
+QUANTILES = (0.5, 0.95, 0.99)
+
+class LatencyHistogram:
+    """Fixed-size log-scale histogram of durations in seconds"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation, capped at the maximum"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                bound = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'total_seconds': self.total,
+            'mean_seconds': self.total / self.count if self.count else 0.0,
+            **{f"p{int(q * 100)}_seconds": self.percentile(q) for q in QUANTILES},
+            'max_seconds': self.max
+        }
+
+    def state_dict(self) -> Dict:
+        return {'counts': list(self.counts), 'count': self.count, 'total': self.total, 'max': self.max}
+
+    def merge(self, state: Dict):
+        """Add the observations of another histogram's state_dict()"""
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, state['counts'])]
+        self.count += state['count']
+        self.total += state['total']
+        self.max = max(self.max, state['max'])
+
+    def load_state(self, state: Dict):
+        self.counts = list(state['counts'])
+        self.count = state['count']
+        self.total = state['total']
+        self.max = state['max']
+
+
+class CrawlMetrics:
+    """Per-stage timing histograms and byte counters for the crawl hot path
+
+    Only updated from the event loop thread (renderer threads hand their
+    timings back with the result), so no locking is needed. Worker metrics
+    are combined through CrawlStats.merge().
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, LatencyHistogram] = {}
+        self.bytes: Dict[str, int] = {}
+
+    def observe(self, stage: str, seconds: float):
+        """Record one duration for a stage"""
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time the enclosed block (awaits included) as one stage observation"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - start)
+
+    def add_bytes(self, kind: str, count: int):
+        """Count bytes downloaded or written"""
+        self.bytes[kind] = self.bytes.get(kind, 0) + count
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage count, total, mean, p50/p95/p99 and max"""
+        return {stage: histogram.summary() for stage, histogram in sorted(self.stages.items())}
+
+    def state_dict(self) -> Dict:
+        return {
+            'stages': {stage: histogram.state_dict() for stage, histogram in self.stages.items()},
+            'bytes': dict(self.bytes)
+        }
+
+    def load_state(self, state: Dict):
+        for stage, saved in state.get('stages', {}).items():
+            self.stages[stage] = LatencyHistogram()
+            self.stages[stage].load_state(saved)
+        self.bytes = dict(state.get('bytes', {}))
+
+    def merge(self, state: Dict):
+        """Add a worker's state_dict() to these metrics"""
+        for stage, saved in state.get('stages', {}).items():
+            self.stages.setdefault(stage, LatencyHistogram()).merge(saved)
+        for kind, count in state.get('bytes', {}).items():
+            self.add_bytes(kind, count)
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """aiohttp tracing that records DNS lookups and new connections as stages"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_dns_start(session, context, params):
+            context.dns_start = time.monotonic()
+
+        async def on_dns_end(session, context, params):
+            self.observe('dns', time.monotonic() - context.dns_start)
+
+        async def on_connect_start(session, context, params):
+            context.connect_start = time.monotonic()
+
+        async def on_connect_end(session, context, params):
+            self.observe('connect', time.monotonic() - context.connect_start)
+
+        trace_config.on_dns_resolvehost_start.append(on_dns_start)
+        trace_config.on_dns_resolvehost_end.append(on_dns_end)
+        trace_config.on_connection_create_start.append(on_connect_start)
+        trace_config.on_connection_create_end.append(on_connect_end)
+        return trace_config
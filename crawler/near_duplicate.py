@@ -0,0 +1,92 @@
+import hashlib
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+def simhash(text: str, shingle_size: int = 3) -> Tuple[int, int]:
+    """64-bit SimHash of a text's word shingles, and the number of words hashed"""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < shingle_size:
+        shingles = Counter([' '.join(words)]) if words else Counter()
+    else:
+        shingles = Counter(' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1))
+
+    weights = [0] * 64
+    for shingle, count in shingles.items():
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(64):
+            weights[bit] += count if value >> bit & 1 else -count
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint, len(words)
+
+
+class NearDuplicateIndex:
+    """SimHashes of archived pages, searchable by Hamming distance
+
+    The 64 bits are split into max_distance + 1 bands; two hashes within
+    max_distance bits must agree exactly on at least one band, so only pages
+    sharing a band are compared.
+    """
+
+    def __init__(self, similarity: float):
+        self.max_distance = max(0, min(63, int((1 - similarity) * 64)))
+        band_count = self.max_distance + 1
+        edges = [round(i * 64 / band_count) for i in range(band_count + 1)]
+        self.bands = [(start, (1 << (end - start)) - 1) for start, end in zip(edges, edges[1:])]
+        self.buckets: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in self.bands]
+        self.count = 0
+
+    def find(self, fingerprint: int) -> Optional[str]:
+        """Get the URL of an indexed page within max_distance bits, if any"""
+        for (shift, mask), buckets in zip(self.bands, self.buckets):
+            for other, url in buckets.get(fingerprint >> shift & mask, ()):
+                if bin(fingerprint ^ other).count('1') <= self.max_distance:
+                    return url
+        return None
+
+    def add(self, fingerprint: int, url: str):
+        """Index an archived page"""
+        for (shift, mask), buckets in zip(self.bands, self.buckets):
+            buckets.setdefault(fingerprint >> shift & mask, []).append((fingerprint, url))
+        self.count += 1
+
+    def remove(self, fingerprint: int, url: str):
+        """Drop a page that was indexed but never archived"""
+        for (shift, mask), buckets in zip(self.bands, self.buckets):
+            items = buckets.get(fingerprint >> shift & mask, [])
+            if (fingerprint, url) in items:
+                items.remove((fingerprint, url))
+        self.count -= 1
+
+    def check_and_add(self, fingerprint: int, url: str) -> Optional[str]:
+        """Return the URL this page nearly duplicates, or index it and return None
+
+        Done in one step so concurrent workers cannot both claim a near-duplicate pair.
+        """
+        match = self.find(fingerprint)
+        if match is None:
+            self.add(fingerprint, url)
+        return match
+
+    def snapshot(self) -> List[List]:
+        """Get the indexed [hex fingerprint, url] pairs as JSON-friendly data"""
+        # Every page sits in exactly one bucket of each band
+        return [
+            [f"{fingerprint:016x}", url]
+            for items in self.buckets[0].values()
+            for fingerprint, url in items
+        ]
+
+    def restore(self, snapshot: List[List]):
+        """Re-index pairs saved by snapshot()"""
+        for fingerprint, url in snapshot:
+            self.add(int(fingerprint, 16), url)
+
+    def __len__(self) -> int:
+        return self.count
@@ -0,0 +1,71 @@
+import json
+import logging
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Checked together so an idle network costs a single round trip to Chrome
+READINESS_SCRIPT = """
+const selector = arguments[0];
+return [document.readyState, selector ? document.querySelector(selector) !== null : true];
+"""
+
+class PageSettler:
+    """Wait until a loaded page is ready to print, based on CDP network events"""
+
+    def __init__(self, idle_time: float, max_wait: float, max_inflight: int,
+                 selectors: Dict[str, str], poll_interval: float = 0.1):
+        self.idle_time = idle_time
+        self.max_wait = max_wait
+        self.max_inflight = max_inflight
+        self.selectors = selectors
+        self.poll_interval = poll_interval
+
+    def selector_for(self, url: str) -> Optional[str]:
+        """Get the readiness selector configured for the URL's domain"""
+        host = (urlparse(url).hostname or '').lower()
+        for domain, selector in self.selectors.items():
+            if host == domain or host.endswith('.' + domain):
+                return selector
+        return None
+
+    @staticmethod
+    def drain_events(driver):
+        """Discard CDP events logged so far"""
+        driver.get_log('performance')
+
+    def wait(self, driver, url: str) -> float:
+        """Block until the page settles or max_wait passes, returning the seconds waited"""
+        selector = self.selector_for(url)
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        last_activity = start
+        inflight = set()
+
+        while True:
+            # Track in-flight requests from the performance log
+            for entry in driver.get_log('performance'):
+                message = json.loads(entry['message'])['message']
+                method = message.get('method')
+                if method == 'Network.requestWillBeSent':
+                    inflight.add(message['params']['requestId'])
+                    last_activity = time.monotonic()
+                elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+                    inflight.discard(message['params']['requestId'])
+                    last_activity = time.monotonic()
+
+            now = time.monotonic()
+            if now >= deadline:
+                logger.info(f"Settle ceiling of {self.max_wait}s reached ({len(inflight)} requests in flight): {url}")
+                break
+
+            if len(inflight) <= self.max_inflight and now - last_activity >= self.idle_time:
+                ready_state, selector_found = driver.execute_script(READINESS_SCRIPT, selector)
+                if ready_state == 'complete' and selector_found:
+                    break
+
+            time.sleep(self.poll_interval)
+
+        return time.monotonic() - start
@@ -1,28 +1,48 @@
 import asyncio
-import aiohttp
 import base64
 import logging
-from typing import Optional
-from selenium import webdriver
+from concurrent.futures import Executor
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 import aiofiles
-import ssl
-import certifi
+from pathlib import Path
 from urllib.parse import urlparse
-from utils.file_utils import calculate_checksum, generate_filename
+from utils.file_utils import checksum_hasher, generate_filename, temp_file_path
+from utils.url_utils import canonicalize_url, with_base_href
 from crawler.config import config
+from crawler.content_index import ContentIndex, IndexEntry
+from crawler.page_settle import PageSettler
+from crawler.pdf_store import PDFStore
+from crawler.render_profile import apply_profile_options, blocked_url_patterns
+from crawler.renderer_pool import RendererPool
 
 logger = logging.getLogger(__name__)
 
 class PDFConverter:
     """Handle PDF conversion and management"""
     
-    def __init__(self):
+    def __init__(self, content_index: ContentIndex):
+        self.content_index = content_index
+        # Set when pdf_checksums is shared with other processes, whose write
+        # locks it may wait for; checksums are then recorded on this executor
+        self.checksum_executor: Optional[Executor] = None
+        self.pdf_store = PDFStore(config.PDFS_DIR, link_mode=config.PDF_LINK_MODE)
         self.driver_options = self._setup_chrome_options()
-        self.driver = None
+        self.page_settler = PageSettler(
+            idle_time=config.SETTLE_IDLE_TIME,
+            max_wait=config.SETTLE_MAX_WAIT,
+            max_inflight=config.SETTLE_MAX_INFLIGHT,
+            selectors=config.SETTLE_SELECTORS
+        )
+        self.renderer_pool = RendererPool(
+            self.driver_options,
+            size=config.RENDERER_POOL_SIZE,
+            max_pages=config.RENDERER_MAX_PAGES,
+            render_timeout=config.RENDER_TIMEOUT,
+            page_load_timeout=config.TIMEOUT,
+            setup_driver=self._setup_driver
+        )
     
     def _setup_chrome_options(self) -> Options:
         """Setup Chrome options for headless browsing"""
@@ -41,117 +61,194 @@ class PDFConverter:
         options.add_experimental_option('useAutomationExtension', False)
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         
+        # Expose CDP network events for the settle strategy
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        
+        apply_profile_options(options, config.RENDER_PROFILE)
         return options
     
-    def _get_driver(self):
-        """Get or create a WebDriver instance"""
-        if self.driver is None:
-            try:
-                self.driver = webdriver.Chrome(options=self.driver_options)
-                logger.info("Chrome WebDriver initialized successfully")
-            except Exception as e:
-                logger.error(f"Failed to initialize Chrome WebDriver: {e}")
-                raise
-        return self.driver
+    def _setup_driver(self, driver):
+        """Block resources that don't affect the printed output"""
+        patterns = blocked_url_patterns(config.RENDER_PROFILE, config.RENDER_BLOCKED_URLS)
+        if patterns:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+            logger.info(f"Render profile '{config.RENDER_PROFILE}' blocks {len(patterns)} URL patterns")
     
-    async def convert_html_to_pdf(self, url: str, stats) -> Optional[str]:
-        """Convert HTML page to PDF"""
+    def _render_pdf(self, driver, url: str, html: str) -> Tuple[Path, str, Dict[str, float]]:
+        """Load already fetched HTML and print it to PDF (runs on a renderer thread)
+
+        Returns the temp file, its checksum and the seconds spent in each stage.
+        """
+        timings = {}
+        # Render the body the crawler fetched instead of letting Chrome download it again
+        start = time.monotonic()
+        driver.get('about:blank')
+        self.page_settler.drain_events(driver)
+        frame_tree = driver.execute_cdp_cmd('Page.getFrameTree', {})
+        driver.execute_cdp_cmd('Page.setDocumentContent', {
+            'frameId': frame_tree['frameTree']['frame']['id'],
+            'html': with_base_href(html, url)
+        })
+        timings['chrome_load'] = time.monotonic() - start
+        
+        # Wait until the network is idle and the document is complete
+        timings['settle'] = self.page_settler.wait(driver, url)
+        
+        # Print to a CDP stream and copy it to disk chunk by chunk
+        start = time.monotonic()
+        pdf_data = driver.execute_cdp_cmd('Page.printToPDF', {
+            'format': 'A4',
+            'printBackground': True,
+            'marginTop': 0.4,
+            'marginBottom': 0.4,
+            'marginLeft': 0.4,
+            'marginRight': 0.4,
+            'transferMode': 'ReturnAsStream'
+        })
+        temp_path = temp_file_path(config.PDFS_DIR)
+        checksum = checksum_hasher()
+        write_seconds = 0.0
+        size = 0
         try:
-            driver = self._get_driver()
-            logger.info(f"Converting HTML to PDF: {url}")
-            
-            driver.get(url)
-            
-            # Wait for page to load
-            WebDriverWait(driver, config.TIMEOUT).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-            
-            # Additional wait for dynamic content
-            await asyncio.sleep(3)
-            
-            # Execute JavaScript to get PDF
-            pdf_data = driver.execute_cdp_cmd('Page.printToPDF', {
-                'format': 'A4',
-                'printBackground': True,
-                'marginTop': 0.4,
-                'marginBottom': 0.4,
-                'marginLeft': 0.4,
-                'marginRight': 0.4
-            })
-            
-            # Decode base64 PDF data
-            pdf_bytes = base64.b64decode(pdf_data['data'])
+            with open(temp_path, 'wb') as f:
+                while True:
+                    chunk = driver.execute_cdp_cmd('IO.read', {
+                        'handle': pdf_data['stream'],
+                        'size': config.PDF_CHUNK_SIZE
+                    })
+                    if chunk.get('base64Encoded'):
+                        data = base64.b64decode(chunk['data'])
+                    else:
+                        data = chunk['data'].encode('utf-8')
+                    write_start = time.monotonic()
+                    checksum.update(data)
+                    f.write(data)
+                    write_seconds += time.monotonic() - write_start
+                    size += len(data)
+                    if chunk.get('eof'):
+                        break
+        except Exception:
+            temp_path.unlink(missing_ok=True)
+            raise
+        finally:
+            driver.execute_cdp_cmd('IO.close', {'handle': pdf_data['stream']})
+        
+        # printToPDF covers Chrome's print and the stream transfer, hash_write the local side
+        timings['hash_write'] = write_seconds
+        timings['print_pdf'] = time.monotonic() - start - write_seconds
+        timings['pdf_bytes'] = size
+        return temp_path, checksum.hexdigest(), timings
+    
+    async def _add_checksum(self, stats, checksum: str) -> bool:
+        """Record a PDF checksum for the run; False if it was already recorded"""
+        if self.checksum_executor is None:
+            return stats.pdf_checksums.add(checksum)
+        return await asyncio.get_running_loop().run_in_executor(self.checksum_executor, stats.pdf_checksums.add, checksum)
+    
+    async def _store_pdf(self, url: str, temp_path: Path, checksum: str, stats, is_pdf: bool = False) -> Optional[Path]:
+        """Move a finished temp file into the store unless this run already saved its content
+
+        Returns the blob path, which stays valid across runs.
+        """
+        # One add() both checks and records, so concurrent workers can't both store it
+        if not await self._add_checksum(stats, checksum):
+            logger.info(f"Duplicate PDF skipped: {url}", extra={'url': url})
+            temp_path.unlink(missing_ok=True)
+            stats.record_duplicate()
+            return None
+        
+        # Save PDF
+        blob = self.pdf_store.put(temp_path, checksum)
+        filename = generate_filename(canonicalize_url(url, config.STRIP_QUERY_PARAMS), is_pdf=is_pdf)
+        logger.info(f"PDF stored for {url}: {self.pdf_store.record(url, str(blob), checksum, filename)}", extra={'url': url})
+        return blob
+    
+    async def keep_unchanged(self, url: str, previous: IndexEntry, stats, is_pdf: bool = False) -> str:
+        """Reuse the PDF a previous run stored for an unchanged URL"""
+        logger.info(f"Unchanged since last run, keeping {previous.stored_path}", extra={'url': url})
+        await self._add_checksum(stats, previous.content_hash)
+        # The run's manifest still lists the URL, so nothing is copied and GC keeps the blob
+        filename = generate_filename(canonicalize_url(url, config.STRIP_QUERY_PARAMS), is_pdf=is_pdf)
+        self.pdf_store.record(url, previous.stored_path, previous.content_hash, filename)
+        stats.record_unchanged()
+        return previous.stored_path
+    
+    async def convert_html_to_pdf(self, url: str, html: str, stats) -> Optional[str]:
+        """Convert a fetched HTML page to PDF"""
+        try:
+            logger.info(f"Converting HTML to PDF: {url}", extra={'url': url})
+            metrics = stats.metrics
+            start = time.monotonic()
+            temp_path, checksum, timings = await self.renderer_pool.render(self._render_pdf, url, html)
+            metrics.add_bytes('written', timings.pop('pdf_bytes'))
+            # Whatever the renderer thread did not account for was spent waiting for a free (or starting) Chrome
+            metrics.observe('render_queue', max(0.0, time.monotonic() - start - sum(timings.values())))
+            for stage, seconds in timings.items():
+                metrics.observe(stage, seconds)
+            logger.info(f"Page settled in {timings['settle']:.2f}s: {url}", extra={'url': url})
             
-            # Check for duplicates
-            checksum = calculate_checksum(pdf_bytes)
-            if checksum in stats.pdf_checksums:
-                logger.info(f"Duplicate PDF skipped: {url}")
-                await stats.record_duplicate()
+            with metrics.span('store'):
+                filepath = await self._store_pdf(url, temp_path, checksum, stats)
+            if filepath is None:
                 return None
             
-            stats.pdf_checksums.add(checksum)
-            
-            # Save PDF
-            filename = generate_filename(url)
-            filepath = config.PDFS_DIR / filename
-            
-            async with aiofiles.open(filepath, 'wb') as f:
-                await f.write(pdf_bytes)
-            
-            logger.info(f"PDF saved: {filepath}")
-            await stats.record_html_page()
+            logger.info(f"PDF saved: {filepath}", extra={'url': url})
+            stats.record_html_page()
             return str(filepath)
             
         except Exception as e:
             error_msg = f"Failed to convert HTML to PDF: {str(e)}"
-            logger.error(f"{error_msg} - URL: {url}")
-            await stats.add_error(url, error_msg)
+            logger.error(f"{error_msg} - URL: {url}", extra={'url': url})
+            stats.add_error(url, error_msg)
             return None
     
-    async def download_pdf(self, url: str, session: aiohttp.ClientSession, stats) -> Optional[str]:
-        """Download existing PDF file"""
+    async def write_pdf(self, chunks: AsyncIterator[bytes]) -> Tuple[Path, str, int]:
+        """Stream a PDF response body to a temp file, hashing as chunks arrive
+
+        Returns the temp file, its checksum and its size.
+        """
+        temp_path = temp_file_path(config.PDFS_DIR)
+        checksum = checksum_hasher()
+        size = 0
+        try:
+            async with aiofiles.open(temp_path, 'wb') as f:
+                async for chunk in chunks:
+                    checksum.update(chunk)
+                    await f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return temp_path, checksum.hexdigest(), size
+    
+    async def save_download(self, url: str, temp_path: Path, checksum: str, etag: Optional[str],
+                            last_modified: Optional[str], previous: Optional[IndexEntry], stats) -> Optional[str]:
+        """Store a PDF written by write_pdf(), skipping it if unchanged since the last run"""
         try:
-            logger.info(f"Downloading PDF: {url}")
+            if previous is not None and previous.is_current(checksum):
+                temp_path.unlink(missing_ok=True)
+                return await self.keep_unchanged(url, previous, stats, is_pdf=True)
             
-            # Create SSL context with certifi certificates
-            ssl_context = ssl.create_default_context(cafile=certifi.where())
+            with stats.metrics.span('store'):
+                filepath = await self._store_pdf(url, temp_path, checksum, stats, is_pdf=True)
+            if filepath is None:
+                return None
+            await self.content_index.put_async(url, etag, last_modified, checksum, str(filepath), [])
             
-            async with session.get(url, ssl=ssl_context) as response:
-                if response.status == 200:
-                    content = await response.read()
-                    
-                    # Check for duplicates
-                    checksum = calculate_checksum(content)
-                    if checksum in stats.pdf_checksums:
-                        logger.info(f"Duplicate PDF skipped: {url}")
-                        await stats.record_duplicate()
-                        return None
-                    
-                    stats.pdf_checksums.add(checksum)
-                    
-                    # Save PDF
-                    filename = generate_filename(url, is_pdf=True)
-                    filepath = config.PDFS_DIR / filename
-                    
-                    async with aiofiles.open(filepath, 'wb') as f:
-                        await f.write(content)
-                    
-                    logger.info(f"PDF downloaded: {filepath}")
-                    await stats.record_pdf_found()
-                    await stats.record_pdf_download()
-                    return str(filepath)
-                else:
-                    raise Exception(f"HTTP {response.status}")
+            logger.info(f"PDF downloaded: {filepath}", extra={'url': url})
+            stats.record_pdf_found()
+            stats.record_pdf_download()
+            return str(filepath)
                     
         except Exception as e:
+            temp_path.unlink(missing_ok=True)
             error_msg = f"Failed to download PDF: {str(e)}"
-            logger.error(f"{error_msg} - URL: {url}")
-            await stats.add_error(url, error_msg)
+            logger.error(f"{error_msg} - URL: {url}", extra={'url': url})
+            stats.add_error(url, error_msg)
             return None
     
     def cleanup(self):
         """Cleanup WebDriver resources"""
-        if self.driver:
-            self.driver.quit()
-            self.driver = None
\ No newline at end of file
+        self.renderer_pool.close()
+        self.pdf_store.close()
\ No newline at end of file
@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+PDF_LINK_MODES = ('hardlink', 'symlink', 'none')
+
+class PDFStore:
+    """Content-addressed PDF storage
+
+    Each distinct PDF is kept once as blobs/<ab>/<cd>/<checksum>.pdf. Every run
+    appends url -> blob lines to manifests/<run_id>.jsonl and, unless link_mode
+    is 'none', links the blob under a readable name in runs/<run_id>/.
+    """
+
+    def __init__(self, root: Path, link_mode: str = 'hardlink'):
+        self.root = root
+        self.blobs_dir = root / 'blobs'
+        self.manifests_dir = root / 'manifests'
+        self.runs_dir = root / 'runs'
+        self.link_mode = link_mode
+        self.run_id: Optional[str] = None
+        self.manifest = None
+        for directory in (self.blobs_dir, self.manifests_dir, self.runs_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def blob_path(self, checksum: str) -> Path:
+        """Where the blob for a checksum lives"""
+        return self.blobs_dir / checksum[:2] / checksum[2:4] / f"{checksum}.pdf"
+
+    def begin_run(self, run_id: str):
+        """Start (or on resume, continue) the manifest for a run"""
+        self.close()
+        self.run_id = run_id
+        # Line buffered so a crash loses at most the line being written
+        self.manifest = open(self.manifests_dir / f"{run_id}.jsonl", 'a', encoding='utf-8', buffering=1)
+
+    def put(self, temp_path: Path, checksum: str) -> Path:
+        """Move a finished temp file into the store, or drop it if the blob already exists"""
+        blob = self.blob_path(checksum)
+        if blob.exists():
+            temp_path.unlink(missing_ok=True)
+            logger.info(f"PDF content already stored as {blob.name}")
+        else:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.replace(blob)
+        return blob
+
+    def record(self, url: str, stored_path: str, checksum: str, filename: str) -> str:
+        """Add a URL to this run's manifest and link its PDF under filename; returns the readable path"""
+        readable = stored_path
+        if self.link_mode != 'none':
+            link = self.runs_dir / self.run_id / filename
+            link.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                if link.exists() or link.is_symlink():
+                    link.unlink()
+                if self.link_mode == 'hardlink':
+                    os.link(stored_path, link)
+                else:
+                    os.symlink(stored_path, link)
+                readable = str(link)
+            except OSError as e:
+                logger.warning(f"Could not link {filename} to {stored_path}: {e}")
+
+        self.manifest.write(json.dumps({
+            'url': url,
+            'checksum': checksum,
+            'blob': stored_path,
+            'file': readable,
+            'recorded_at': datetime.now().isoformat()
+        }) + '\n')
+        return readable
+
+    def referenced_blobs(self) -> Set[str]:
+        """Blob paths named by any manifest"""
+        referenced = set()
+        for manifest in self.manifests_dir.glob('*.jsonl'):
+            with open(manifest, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        referenced.add(str(Path(json.loads(line)['blob']).resolve()))
+                    except (ValueError, KeyError):
+                        # A line cut short by a crash
+                        continue
+        return referenced
+
+    def collect_garbage(self, dry_run: bool = False) -> Tuple[int, int]:
+        """Delete blobs no manifest references, and run folders whose manifest is gone
+
+        Returns the number of blobs and bytes freed (or that would be freed).
+        """
+        referenced = self.referenced_blobs()
+        removed = 0
+        freed = 0
+        for blob in self.blobs_dir.glob('*/*/*.pdf'):
+            if str(blob.resolve()) in referenced:
+                continue
+            removed += 1
+            freed += blob.stat().st_size
+            if not dry_run:
+                blob.unlink()
+
+        manifests = {manifest.stem for manifest in self.manifests_dir.glob('*.jsonl')}
+        for run_dir in self.runs_dir.iterdir():
+            if run_dir.is_dir() and run_dir.name not in manifests:
+                logger.info(f"Removing links of deleted run {run_dir.name}")
+                if not dry_run:
+                    shutil.rmtree(run_dir)
+
+        if not dry_run:
+            for shard in sorted(self.blobs_dir.glob('*/*'), reverse=True) + sorted(self.blobs_dir.glob('*')):
+                if shard.is_dir() and not any(shard.iterdir()):
+                    shard.rmdir()
+        return removed, freed
+
+    def close(self):
+        """Close the current run's manifest"""
+        if self.manifest is not None:
+            self.manifest.close()
+            self.manifest = None
@@ -0,0 +1,45 @@
+from typing import List
+from selenium.webdriver.chrome.options import Options
+
+RENDER_PROFILES = ('full', 'light', 'text')
+
+# URL patterns for Network.setBlockedURLs ('*' is a wildcard)
+TRACKER_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*connect.facebook.net*', '*hotjar.com*',
+    '*nr-data.net*', '*js-agent.newrelic.com*', '*cdn.segment.com*',
+    '*quantserve.com*', '*scorecardresearch.com*', '*clarity.ms*',
+    '*siteimproveanalytics.com*', '*dap.digitalgov.gov*'
+]
+MEDIA_PATTERNS = ['*.mp4*', '*.webm*', '*.m3u8*', '*.mp3*', '*.ogg*', '*.wav*']
+FONT_PATTERNS = [
+    '*.woff*', '*.ttf*', '*.otf*', '*.eot*',
+    '*fonts.googleapis.com*', '*fonts.gstatic.com*', '*use.typekit.net*'
+]
+EMBED_PATTERNS = [
+    '*youtube.com/embed*', '*youtube-nocookie.com*', '*player.vimeo.com*',
+    '*platform.twitter.com*', '*facebook.com/plugins*', '*disqus.com*'
+]
+IMAGE_PATTERNS = ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*', '*.bmp*']
+
+def blocked_url_patterns(profile: str, extra_patterns: List[str]) -> List[str]:
+    """Get the URL patterns Chrome should not load for a render profile"""
+    patterns = []
+    if profile in ('light', 'text'):
+        patterns += TRACKER_PATTERNS + MEDIA_PATTERNS + FONT_PATTERNS + EMBED_PATTERNS
+    if profile == 'text':
+        patterns += IMAGE_PATTERNS
+    return patterns + list(extra_patterns)
+
+def apply_profile_options(options: Options, profile: str):
+    """Add Chrome switches that make a render profile cheaper to run"""
+    if profile in ('light', 'text'):
+        options.add_argument('--mute-audio')
+        options.add_argument('--autoplay-policy=user-gesture-required')
+        options.add_argument('--disable-background-networking')
+        options.add_argument('--disable-component-update')
+        options.add_argument('--disable-default-apps')
+        options.add_argument('--disable-sync')
+        options.add_argument('--no-first-run')
+    if profile == 'text':
+        options.add_argument('--blink-settings=imagesEnabled=false')
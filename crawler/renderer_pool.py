@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+logger = logging.getLogger(__name__)
+
+class ChromeRenderer:
+    """A headless Chrome instance driven from its own worker thread"""
+
+    def __init__(self, renderer_id: int, options: Options, page_load_timeout: int,
+                 setup_driver: Optional[Callable] = None):
+        self.renderer_id = renderer_id
+        self.options = options
+        self.page_load_timeout = page_load_timeout
+        self.setup_driver = setup_driver
+        self.driver = None
+        self.pages_rendered = 0
+        self.executor = self._new_executor()
+
+    def _new_executor(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"chrome-{self.renderer_id}")
+
+    def _launch(self):
+        """Start Chrome (runs on the renderer thread)"""
+        driver = webdriver.Chrome(options=self.options)
+        driver.set_page_load_timeout(self.page_load_timeout)
+        if self.setup_driver is not None:
+            self.setup_driver(driver)
+        logger.info(f"Chrome renderer {self.renderer_id} started")
+        return driver
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Failed to quit Chrome cleanly: {e}")
+
+    async def run(self, func: Callable, *args, timeout: float) -> Any:
+        """Run func(driver, *args) on the renderer thread"""
+        loop = asyncio.get_running_loop()
+        try:
+            if self.driver is None:
+                self.driver = await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, self._launch), timeout
+                )
+
+            result = await asyncio.wait_for(
+                loop.run_in_executor(self.executor, func, self.driver, *args), timeout
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Chrome renderer {self.renderer_id} timed out after {timeout}s")
+        self.pages_rendered += 1
+        return result
+
+    async def recycle(self):
+        """Throw away the browser and its thread so a hung call cannot block the next job"""
+        driver, self.driver = self.driver, None
+        old_executor, self.executor = self.executor, self._new_executor()
+        old_executor.shutdown(wait=False)
+        self.pages_rendered = 0
+
+        # Quitting kills chromedriver, which also unblocks a call stuck on the old thread
+        if driver is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                await asyncio.wait_for(loop.run_in_executor(None, self._quit, driver), 30)
+            except asyncio.TimeoutError:
+                logger.warning(f"Chrome renderer {self.renderer_id} did not quit in time")
+
+        logger.info(f"Chrome renderer {self.renderer_id} recycled")
+
+    def close(self):
+        """Quit the browser and stop the worker thread"""
+        if self.driver is not None:
+            self._quit(self.driver)
+            self.driver = None
+        self.executor.shutdown(wait=False)
+
+
+class RendererPool:
+    """Pool of Chrome renderers that jobs check out and return"""
+
+    def __init__(self, options: Options, size: int, max_pages: int, render_timeout: float, page_load_timeout: int,
+                 setup_driver: Optional[Callable] = None):
+        self.max_pages = max_pages
+        self.render_timeout = render_timeout
+        self.renderers: List[ChromeRenderer] = [
+            ChromeRenderer(i, options, page_load_timeout, setup_driver) for i in range(max(1, size))
+        ]
+        self.idle: asyncio.Queue = asyncio.Queue()
+        for renderer in self.renderers:
+            self.idle.put_nowait(renderer)
+
+    async def render(self, func: Callable, *args) -> Any:
+        """Run func(driver, *args) on the next free renderer"""
+        renderer = await self.idle.get()
+        try:
+            return await renderer.run(func, *args, timeout=self.render_timeout)
+        except Exception as e:
+            # Crashed or hung browsers are replaced before anyone else gets them
+            logger.warning(f"Chrome renderer {renderer.renderer_id} failed ({type(e).__name__}), recycling")
+            await renderer.recycle()
+            raise
+        finally:
+            # Restart periodically to stop Chrome memory growth
+            if renderer.pages_rendered >= self.max_pages:
+                await renderer.recycle()
+            self.idle.put_nowait(renderer)
+
+    def close(self):
+        """Shut down every renderer"""
+        for renderer in self.renderers:
+            renderer.close()
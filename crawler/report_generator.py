@@ -1,7 +1,10 @@
+import html
+import itertools
 import json
 from datetime import datetime
 from pathlib import Path
 from crawler.config import config
+from crawler.error_log import ErrorLog
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,7 +29,12 @@ class ReportGenerator:
                 .stats {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin: 20px 0; }}
                 .stat-box {{ background-color: #e7f3ff; padding: 15px; border-radius: 5px; text-align: center; }}
                 .errors {{ background-color: #ffe7e7; padding: 15px; border-radius: 5px; margin: 20px 0; }}
+                .error-table {{ border-collapse: collapse; margin: 10px 0; }}
+                .error-table th, .error-table td {{ border: 1px solid #f0c0c0; padding: 4px 10px; text-align: left; }}
                 .error-item {{ margin: 10px 0; padding: 10px; background-color: white; border-radius: 3px; }}
+                .timings {{ border-collapse: collapse; margin: 20px 0; }}
+                .timings th, .timings td {{ border: 1px solid #ddd; padding: 6px 12px; text-align: right; }}
+                .timings th:first-child, .timings td:first-child {{ text-align: left; }}
             </style>
         </head>
         <body>
@@ -34,6 +42,9 @@ class ReportGenerator:
                 <h1>Website Crawler Report</h1>
                 <p>Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
                 <p>Duration: {stats_dict['duration_minutes']:.2f} minutes</p>
+                <p>Throughput: {stats_dict['pages_per_minute']:.1f} pages/min,
+                   {stats_dict['bytes_downloaded'] / 1024 / 1024:.1f} MiB downloaded,
+                   {stats_dict['bytes_written'] / 1024 / 1024:.1f} MiB written</p>
             </div>
             
             <div class="stats">
@@ -53,38 +64,164 @@ class ReportGenerator:
                     <h3>{stats_dict['duplicates_skipped']}</h3>
                     <p>Duplicates Skipped</p>
                 </div>
+                <div class="stat-box">
+                    <h3>{stats_dict['unchanged_skipped']}</h3>
+                    <p>Unchanged Skipped</p>
+                </div>
+                <div class="stat-box">
+                    <h3>{stats_dict['near_duplicates_skipped']}</h3>
+                    <p>Near-Duplicates Skipped</p>
+                </div>
+                <div class="stat-box">
+                    <h3>{stats_dict['avg_settle_seconds']:.2f}s</h3>
+                    <p>Avg Page Settle</p>
+                </div>
+                <div class="stat-box">
+                    <h3>{stats_dict['seen_store_bytes'] / 1024:.1f} KiB</h3>
+                    <p>Seen-Set Memory</p>
+                </div>
                 <div class="stat-box">
                     <h3>{stats_dict['errors_count']}</h3>
                     <p>Errors</p>
                 </div>
             </div>
             
-            {"<div class='errors'><h2>Errors</h2>" + 
-             "".join([
-                 f"<div class='error-item'><strong>URL:</strong> {error['url']}<br>"
-                 f"<strong>Error:</strong> {error['error']}<br>"
-                 f"<strong>Time:</strong> {error['timestamp']}</div>" 
-                 for error in stats_dict['errors']
-             ]) + "</div>" 
-             if stats_dict['errors'] else ""}
-        </body>
-        </html>
+            <h2>Stage Timings</h2>
+            <table class="timings">
+                <tr><th>Stage</th><th>Count</th><th>Total (s)</th><th>p50 (s)</th><th>p95 (s)</th><th>p99 (s)</th><th>Max (s)</th></tr>
+                {"".join(
+                    f"<tr><td>{stage}</td><td>{t['count']}</td><td>{t['total_seconds']:.2f}</td>"
+                    f"<td>{t['p50_seconds']:.3f}</td><td>{t['p95_seconds']:.3f}</td>"
+                    f"<td>{t['p99_seconds']:.3f}</td><td>{t['max_seconds']:.3f}</td></tr>"
+                    for stage, t in stats_dict['stage_timings'].items()
+                )}
+            </table>
         """
         
+        # Written piece by piece so report size, not error count, bounds memory
         with open(report_file, 'w', encoding='utf-8') as f:
             f.write(html_content)
+            if stats_dict['errors_count']:
+                ReportGenerator._write_error_summary(f, stats_dict, report_file)
+            f.write("</body></html>\n")
         
         logger.info(f"HTML report generated: {report_file}")
         return str(report_file)
     
+    @staticmethod
+    def _write_error_summary(f, stats_dict, report_file: Path):
+        """Write error counts by class and host, the top groups with samples, and links to the full list"""
+        f.write("<div class='errors'><h2>Errors</h2>\n")
+        for title, counts in (('By error', stats_dict['errors_by_class']), ('By host', stats_dict['errors_by_host'])):
+            f.write(f"<h3>{title}</h3><table class='error-table'>\n")
+            for key, count in itertools.islice(counts.items(), config.REPORT_TOP_ERRORS):
+                f.write(f"<tr><td>{html.escape(key)}</td><td>{count}</td></tr>\n")
+            f.write("</table>\n")
+        
+        f.write(f"<h3>Top {len(stats_dict['top_errors'])} error groups</h3>\n")
+        for group in stats_dict['top_errors']:
+            f.write(f"<h4>{group['count']} × {html.escape(group['error_class'])} ({html.escape(group['host'])})</h4>\n")
+            for error in group['samples']:
+                f.write(ReportGenerator._error_item(error))
+        
+        if stats_dict.get('errors_file'):
+            pages = ReportGenerator._write_error_pages(Path(stats_dict['errors_file']), report_file)
+            if pages:
+                f.write(f"<p>All errors: <a href='{pages[0].name}'>{len(pages)} page(s)</a></p>\n")
+        f.write("</div>\n")
+    
+    @staticmethod
+    def _error_item(error) -> str:
+        return (f"<div class='error-item'><strong>URL:</strong> {html.escape(error['url'])}<br>"
+                f"<strong>Error:</strong> {html.escape(error['error'])}<br>"
+                f"<strong>Time:</strong> {error['timestamp']}</div>\n")
+    
+    @staticmethod
+    def _write_error_pages(errors_file: Path, report_file: Path) -> list:
+        """Stream the error spool into REPORT_ERRORS_PER_PAGE-sized HTML pages next to the report"""
+        errors = ErrorLog.read(errors_file)
+        per_page = config.REPORT_ERRORS_PER_PAGE
+        
+        def page_path(number: int) -> Path:
+            return report_file.with_name(f"{report_file.stem}_errors_{number}.html")
+        
+        pages = []
+        batch = list(itertools.islice(errors, per_page))
+        while batch:
+            # One page of lookahead tells whether a "next" link is needed
+            next_batch = list(itertools.islice(errors, per_page))
+            number = len(pages) + 1
+            path = page_path(number)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f"<!DOCTYPE html><html><head><title>Errors, page {number}</title></head><body>\n")
+                f.write(f"<p><a href='{report_file.name}'>Report</a>")
+                if number > 1:
+                    f.write(f" | <a href='{page_path(number - 1).name}'>Previous</a>")
+                if next_batch:
+                    f.write(f" | <a href='{page_path(number + 1).name}'>Next</a>")
+                f.write("</p>\n")
+                for error in batch:
+                    f.write(ReportGenerator._error_item(error))
+                f.write("</body></html>\n")
+            pages.append(path)
+            batch = next_batch
+        return pages
+    
     @staticmethod
     def generate_json_report(stats_dict) -> str:
         """Generate JSON report from stats dictionary"""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         report_file = config.REPORTS_DIR / f"crawl_report_{timestamp}.json"
         
+        # json.dump encodes and writes chunk by chunk; errors are already summarized,
+        # the full list stays in stats_dict['errors_file']
         with open(report_file, 'w', encoding='utf-8') as f:
             json.dump(stats_dict, f, indent=2, default=str)
         
         logger.info(f"JSON report generated: {report_file}")
+        return str(report_file)
+    
+    @staticmethod
+    def generate_metrics_report(stats_dict) -> str:
+        """Write stage timings and counters in the Prometheus text format"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        report_file = config.REPORTS_DIR / f"crawl_metrics_{timestamp}.prom"
+        
+        lines = [
+            '# HELP crawler_stage_seconds Time spent in each crawl stage.',
+            '# TYPE crawler_stage_seconds summary'
+        ]
+        for stage, timing in stats_dict['stage_timings'].items():
+            for quantile in ('0.5', '0.95', '0.99'):
+                value = timing[f"p{int(float(quantile) * 100)}_seconds"]
+                lines.append(f'crawler_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {value}')
+            lines.append(f'crawler_stage_seconds_sum{{stage="{stage}"}} {timing["total_seconds"]}')
+            lines.append(f'crawler_stage_seconds_count{{stage="{stage}"}} {timing["count"]}')
+        
+        counters = {
+            'pages_crawled': 'HTML pages converted to PDF.',
+            'pdfs_downloaded': 'PDF files downloaded.',
+            'duplicates_skipped': 'Duplicate PDFs skipped.',
+            'unchanged_skipped': 'URLs unchanged since the last run.',
+            'near_duplicates_skipped': 'Near-duplicate pages not rendered.',
+            'errors_count': 'Errors recorded.',
+            'bytes_downloaded': 'Response body bytes downloaded.',
+            'bytes_written': 'PDF bytes written to disk.'
+        }
+        for name, help_text in counters.items():
+            lines += [
+                f'# HELP crawler_{name}_total {help_text}',
+                f'# TYPE crawler_{name}_total counter',
+                f'crawler_{name}_total {stats_dict[name]}'
+            ]
+        lines += [
+            '# HELP crawler_pages_per_minute Pages and PDFs processed per minute.',
+            '# TYPE crawler_pages_per_minute gauge',
+            f"crawler_pages_per_minute {stats_dict['pages_per_minute']}"
+        ]
+        
+        with open(report_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        
+        logger.info(f"Metrics report generated: {report_file}")
         return str(report_file)
\ No newline at end of file
@@ -2,7 +2,9 @@ from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.executors.pool import ThreadPoolExecutor
 import asyncio
+from datetime import timedelta
 import logging
+from crawler.checkpoint import CrawlCheckpoint
 from crawler.web_crawler import WebCrawler
 from crawler.report_generator import ReportGenerator
 from crawler.config import config
@@ -12,13 +14,22 @@ logger = logging.getLogger(__name__)
 async def run_scheduled_crawl():
     """Function to run scheduled crawling"""
     try:
+        # Pick up where a crashed run left off instead of starting from scratch,
+        # unless it is older than a schedule interval and a fresh crawl is due anyway
+        resume_run_id = CrawlCheckpoint.latest_unfinished(config.CHECKPOINTS_DIR,
+                                                          timedelta(hours=config.SCHEDULE_HOURS))
+        if resume_run_id:
+            logger.info(f"Resuming unfinished crawl run {resume_run_id}")
+        
         crawler = WebCrawler()
-        stats = await crawler.run_crawl()
-        stats_dict = stats.to_dict()  # Convert to dictionary
+        stats = await crawler.run_crawl(resume_run_id)
+        stats_dict = stats.to_dict(config.REPORT_TOP_ERRORS)  # Convert to dictionary
         
         # Generate reports
         ReportGenerator.generate_html_report(stats_dict)
         ReportGenerator.generate_json_report(stats_dict)
+        if config.METRICS_EXPORT:
+            ReportGenerator.generate_metrics_report(stats_dict)
         
         logger.info("Scheduled crawl completed successfully")
         return stats_dict
@@ -0,0 +1,285 @@
+import base64
+import hashlib
+import logging
+import math
+import sqlite3
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SEEN_STORES = ('set', 'fingerprint', 'bloom', 'disk')
+
+def fingerprint(value: str) -> int:
+    """64-bit fingerprint of a string (never 0, which marks empty slots)"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big') or 1
+
+
+class ExactSeenStore:
+    """Plain set of strings; exact, but the largest per entry"""
+
+    kind = 'set'
+
+    def __init__(self):
+        self.items = set()
+
+    def add(self, value: str) -> bool:
+        """Add a value, returning False if it was already present"""
+        if value in self.items:
+            return False
+        self.items.add(value)
+        return True
+
+    def __contains__(self, value: str) -> bool:
+        return value in self.items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self.items) + sum(sys.getsizeof(item) for item in self.items)
+
+    def snapshot(self):
+        return list(self.items)
+
+    def restore(self, data):
+        self.items.update(data)
+
+    def close(self):
+        pass
+
+
+class FingerprintSet:
+    """Open-addressing hash set of 64-bit fingerprints packed in an array (~16 bytes per entry)"""
+
+    kind = 'fingerprint'
+
+    def __init__(self, capacity: int = 1024):
+        self.slots = array('Q', [0]) * max(16, 1 << math.ceil(math.log2(capacity * 2)))
+        self.count = 0
+
+    def _find(self, fp: int) -> int:
+        mask = len(self.slots) - 1
+        index = fp & mask
+        while True:
+            slot = self.slots[index]
+            if slot == 0 or slot == fp:
+                return index
+            index = (index + 1) & mask
+
+    def _grow(self):
+        old_slots = self.slots
+        self.slots = array('Q', [0]) * (len(old_slots) * 2)
+        for fp in old_slots:
+            if fp:
+                self.slots[self._find(fp)] = fp
+
+    def add_fingerprint(self, fp: int) -> bool:
+        """Add a precomputed fingerprint, returning False if it was already present"""
+        index = self._find(fp)
+        if self.slots[index] == fp:
+            return False
+        self.slots[index] = fp
+        self.count += 1
+        if self.count * 2 > len(self.slots):
+            self._grow()
+        return True
+
+    def contains_fingerprint(self, fp: int) -> bool:
+        return self.slots[self._find(fp)] == fp
+
+    def fingerprints(self) -> Iterable[int]:
+        return (fp for fp in self.slots if fp)
+
+    def add(self, value: str) -> bool:
+        """Add a value, returning False if it was already present"""
+        return self.add_fingerprint(fingerprint(value))
+
+    def __contains__(self, value: str) -> bool:
+        return self.contains_fingerprint(fingerprint(value))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def memory_bytes(self) -> int:
+        return self.slots.itemsize * len(self.slots)
+
+    def snapshot(self) -> List[int]:
+        return list(self.fingerprints())
+
+    def restore(self, data: Iterable[int]):
+        for fp in data:
+            self.add_fingerprint(fp)
+
+    def close(self):
+        pass
+
+
+class BloomFilter:
+    """Bloom filter sized for capacity entries at error_rate false positives
+
+    Never reports a seen value as new; may report a new value as seen with
+    probability error_rate. Past capacity a second, larger filter is chained on.
+    """
+
+    kind = 'bloom'
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bit_count = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0
+        self.next: Optional['BloomFilter'] = None
+
+    def _positions(self, value: str) -> List[int]:
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.bit_count for i in range(self.hash_count)]
+
+    def __contains__(self, value: str) -> bool:
+        if all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value)):
+            return True
+        return self.next is not None and value in self.next
+
+    def add(self, value: str) -> bool:
+        """Add a value, returning False if it was (probably) already present"""
+        if value in self:
+            return False
+        if self.count >= self.capacity:
+            if self.next is None:
+                logger.info(f"Bloom filter reached {self.capacity} entries, chaining a larger one")
+                self.next = BloomFilter(self.capacity * 2, self.error_rate)
+            return self.next.add(value)
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+        return True
+
+    def __len__(self) -> int:
+        return self.count + (len(self.next) if self.next is not None else 0)
+
+    def memory_bytes(self) -> int:
+        return len(self.bits) + (self.next.memory_bytes() if self.next is not None else 0)
+
+    def snapshot(self) -> List[Dict]:
+        chain = []
+        bloom = self
+        while bloom is not None:
+            chain.append({
+                'capacity': bloom.capacity,
+                'count': bloom.count,
+                'bits': base64.b64encode(bytes(bloom.bits)).decode('ascii')
+            })
+            bloom = bloom.next
+        return chain
+
+    def restore(self, data: List[Dict]):
+        bloom = self
+        for index, saved in enumerate(data):
+            if index:
+                bloom.next = BloomFilter(saved['capacity'], self.error_rate)
+                bloom = bloom.next
+            bloom.bits = bytearray(base64.b64decode(saved['bits']))
+            bloom.count = saved['count']
+
+    def close(self):
+        pass
+
+
+class DiskSeenStore:
+    """Fingerprints kept in memory up to memory_limit entries, then spilled to SQLite"""
+
+    kind = 'disk'
+
+    def __init__(self, path: Path, memory_limit: int):
+        self.path = path
+        self.memory_limit = memory_limit
+        self.memory = FingerprintSet()
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS seen (fp INTEGER PRIMARY KEY)')
+        self.spilled = self.conn.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    @staticmethod
+    def _signed(fp: int) -> int:
+        # SQLite integers are signed 64-bit
+        return fp - (1 << 64) if fp >= (1 << 63) else fp
+
+    def _on_disk(self, fp: int) -> bool:
+        return self.conn.execute('SELECT 1 FROM seen WHERE fp = ?', (self._signed(fp),)).fetchone() is not None
+
+    def _spill(self):
+        if not len(self.memory):
+            return
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO seen VALUES (?)',
+                ((self._signed(fp),) for fp in self.memory.fingerprints())
+            )
+        self.spilled += len(self.memory)
+        logger.info(f"Spilled {len(self.memory)} seen fingerprints to {self.path}")
+        self.memory = FingerprintSet()
+
+    def add(self, value: str) -> bool:
+        """Add a value, returning False if it was already present"""
+        fp = fingerprint(value)
+        if self.memory.contains_fingerprint(fp) or (self.spilled and self._on_disk(fp)):
+            return False
+        self.memory.add_fingerprint(fp)
+        if len(self.memory) >= self.memory_limit:
+            self._spill()
+        return True
+
+    def __contains__(self, value: str) -> bool:
+        fp = fingerprint(value)
+        return self.memory.contains_fingerprint(fp) or (self.spilled > 0 and self._on_disk(fp))
+
+    def __len__(self) -> int:
+        return len(self.memory) + self.spilled
+
+    def memory_bytes(self) -> int:
+        return self.memory.memory_bytes()
+
+    def snapshot(self) -> Dict:
+        # Everything goes to disk so a resumed run only needs the path
+        self._spill()
+        return {'path': str(self.path)}
+
+    def restore(self, data: Dict):
+        pass
+
+    def close(self):
+        self.conn.close()
+
+
+def create_seen_store(kind: str, name: str, directory: Path, bloom_capacity: int = 1_000_000,
+                      bloom_error_rate: float = 0.001, memory_limit: int = 100_000):
+    """Build a seen-store of the given kind; name identifies its spill file"""
+    if kind == 'set':
+        return ExactSeenStore()
+    if kind == 'fingerprint':
+        return FingerprintSet()
+    if kind == 'bloom':
+        return BloomFilter(bloom_capacity, bloom_error_rate)
+    if kind == 'disk':
+        return DiskSeenStore(directory / f"{name}.sqlite", memory_limit)
+    raise ValueError(f"Unknown seen store: {kind} (expected one of {', '.join(SEEN_STORES)})")
+
+
+def restore_seen_store(store, data, kind: str = 'set'):
+    """Load snapshot() data saved by a store of the given kind into store
+
+    Plain string lists (older checkpoints, or the 'set' store) can be loaded
+    into any store; other snapshots only into a store of the same kind.
+    """
+    if kind == store.kind:
+        store.restore(data)
+    elif kind == 'set':
+        for value in data:
+            store.add(value)
+    else:
+        logger.warning(f"Cannot restore a {kind} snapshot into a {store.kind} store, starting empty")
@@ -0,0 +1,180 @@
+import logging
+import zlib
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, NamedTuple, Optional
+from urllib.parse import urlparse
+import aiohttp
+from lxml import etree
+from crawler.host_scheduler import HostScheduler
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b'\x1f\x8b'
+SITEMAP_CHUNK_SIZE = 64 * 1024
+# The sitemap protocol caps a file at 50 MB uncompressed; also stops gzip bombs
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+
+def parse_lastmod(text: Optional[str]) -> Optional[datetime]:
+    """Parse a W3C datetime <lastmod> as an aware datetime; None if missing or unparseable
+
+    A bare date stands for the end of that day, so pages changed later
+    that day are not taken as unchanged.
+    """
+    text = (text or '').strip()
+    try:
+        if len(text) == 10:
+            return datetime.fromisoformat(text).replace(tzinfo=timezone.utc) + timedelta(days=1)
+        value = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class SitemapEntry(NamedTuple):
+    """A <url> of a sitemap, or a <sitemap> of a sitemap index"""
+    url: str
+    lastmod: Optional[datetime] = None
+    is_sitemap: bool = False
+
+
+class SitemapParser:
+    """Parse sitemap XML (gzipped or not) and plain-text sitemaps fed in chunks"""
+
+    def __init__(self, max_bytes: int = MAX_SITEMAP_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.decompressor = None
+        self.started = False
+        self.xml: Optional[etree.XMLPullParser] = None
+        self.text_tail = b''  # unfinished last line of a plain-text sitemap
+        self.entries: List[SitemapEntry] = []
+
+    def feed(self, chunk: bytes) -> List[SitemapEntry]:
+        """Parse the next chunk and return the entries it completed"""
+        if not self.started and self.decompressor is None and chunk.startswith(GZIP_MAGIC):
+            # .xml.gz files are served as-is, not with Content-Encoding
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self.decompressor is not None:
+            chunk = self.decompressor.decompress(chunk, self.max_bytes - self.size + 1)
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise ValueError(f"Sitemap larger than {self.max_bytes} bytes")
+
+        if not self.started:
+            chunk = chunk.lstrip(b'\xef\xbb\xbf \t\r\n')
+            if not chunk:
+                return []
+            self.started = True
+            if chunk.startswith(b'<'):
+                # No entity expansion or network access for untrusted XML
+                self.xml = etree.XMLPullParser(events=('end',), resolve_entities=False, no_network=True)
+
+        if self.xml is not None:
+            self.xml.feed(chunk)
+            self._read_events()
+        else:
+            lines = (self.text_tail + chunk).split(b'\n')
+            self.text_tail = lines.pop()
+            self._add_lines(lines)
+        return self._take()
+
+    def close(self) -> List[SitemapEntry]:
+        """Finish parsing and return the remaining entries"""
+        if self.xml is not None:
+            self.xml.close()
+            self._read_events()
+        else:
+            self._add_lines([self.text_tail])
+            self.text_tail = b''
+        return self._take()
+
+    def _read_events(self):
+        for _, element in self.xml.read_events():
+            if not isinstance(element.tag, str):
+                continue
+            name = etree.QName(element).localname
+            if name not in ('url', 'sitemap'):
+                continue
+            loc = lastmod = None
+            for child in element:
+                if not isinstance(child.tag, str):
+                    continue
+                child_name = etree.QName(child).localname
+                if child_name == 'loc':
+                    loc = (child.text or '').strip()
+                elif child_name == 'lastmod':
+                    lastmod = parse_lastmod(child.text)
+            if loc:
+                self.entries.append(SitemapEntry(loc, lastmod, name == 'sitemap'))
+            # Drop what has been read so memory stays flat on large files
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+    def _add_lines(self, lines: List[bytes]):
+        for line in lines:
+            url = line.decode('utf-8', errors='replace').strip()
+            if url.startswith(('http://', 'https://')):
+                self.entries.append(SitemapEntry(url))
+
+    def _take(self) -> List[SitemapEntry]:
+        entries, self.entries = self.entries, []
+        return entries
+
+
+class SitemapDiscovery:
+    """Find a site's URLs through its robots.txt Sitemap: lines and sitemap index files"""
+
+    def __init__(self, host_scheduler: HostScheduler, max_files: int = 50, max_urls: int = 100_000):
+        self.host_scheduler = host_scheduler
+        self.max_files = max_files
+        self.max_urls = max_urls
+
+    async def discover(self, base_url: str, session: aiohttp.ClientSession) -> AsyncIterator[SitemapEntry]:
+        """Yield the page entries of every sitemap reachable from the site's robots.txt
+
+        Falls back to /sitemap.xml when robots.txt lists none. At most
+        max_files sitemap files are read and max_urls entries yielded.
+        """
+        parsed = urlparse(base_url)
+        listed = await self.host_scheduler.sitemaps(base_url, session)
+        queue = deque(listed or [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"])
+        fetched = set()
+        count = 0
+        while queue and len(fetched) < self.max_files:
+            sitemap_url = queue.popleft()
+            if sitemap_url in fetched:
+                continue
+            fetched.add(sitemap_url)
+            try:
+                async for entry in self._read(sitemap_url, session):
+                    if entry.is_sitemap:
+                        queue.append(entry.url)
+                        continue
+                    yield entry
+                    count += 1
+                    if count >= self.max_urls:
+                        logger.info(f"Sitemap URL limit of {self.max_urls} reached for {base_url}")
+                        return
+            except Exception as e:
+                logger.warning(f"Could not read sitemap {sitemap_url}: {e}")
+        if queue:
+            logger.info(f"Sitemap file limit of {self.max_files} reached for {base_url}, {len(queue)} not read")
+        logger.info(f"Read {len(fetched)} sitemap files with {count} URLs for {base_url}")
+
+    async def _read(self, url: str, session: aiohttp.ClientSession) -> AsyncIterator[SitemapEntry]:
+        async with self.host_scheduler.slot(url, session) as slot:
+            async with session.get(url) as response:
+                slot.record(response)
+                if response.status in (404, 410):
+                    logger.info(f"No sitemap at {url}")
+                    return
+                if response.status != 200:
+                    raise Exception(f"HTTP {response.status}")
+                parser = SitemapParser()
+                async for chunk in response.content.iter_chunked(SITEMAP_CHUNK_SIZE):
+                    for entry in parser.feed(chunk):
+                        yield entry
+                for entry in parser.close():
+                    yield entry
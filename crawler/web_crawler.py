@@ -1,138 +1,482 @@
 import asyncio
+import time
 import aiohttp
-import ssl
-import certifi
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from typing import Set, List
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
 import logging
 
+from crawler.checkpoint import CrawlCheckpoint
 from crawler.config import config
-from crawler.crawl_stats import CrawlStats
+from crawler.content_index import ContentIndex, IndexEntry
+from crawler.content_type import ContentTypeCache, HTML, PDF, classify, iter_body, read_head, url_pattern
+from crawler.crawl_stats import CrawlStats, SiteStats
+from crawler.error_log import ErrorLog
+from crawler.frontier import Frontier, UrlScorer
+from crawler.host_scheduler import HostScheduler
+from crawler.http_client import HttpClient
+from crawler.link_extractor import LinkExtractor, html_encoding
+from crawler.metrics import CrawlMetrics
+from crawler.near_duplicate import NearDuplicateIndex, simhash
 from crawler.pdf_converter import PDFConverter
-from utils.url_utils import is_valid_url, is_pdf_url, get_base_domain
+from crawler.seen_store import FingerprintSet, create_seen_store, fingerprint
+from crawler.sitemap import SitemapDiscovery
+from utils.file_utils import checksum_hasher
+from utils.url_utils import is_valid_url, is_pdf_url, get_base_domain, canonicalize_url, url_key
 
 logger = logging.getLogger(__name__)
 
+# Seconds between retries when every remaining page slot is reserved
+RESERVATION_POLL_INTERVAL = 0.1
+
+class FetchedPage(NamedTuple):
+    """An HTML page (or PDF) fetched by the crawler"""
+    url: str
+    html: Optional[str]  # None when the server answered 304 Not Modified
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: Optional[str] = None
+    links: List[str] = []
+    truncated: bool = False  # body cut off at MAX_PAGE_BYTES
+    text: str = ''  # main text, for near-duplicate detection
+    pdf_path: Optional[Path] = None  # set instead of html when the response was a PDF, streamed to this temp file
+
+
+class Site(NamedTuple):
+    """One BASE_URLS site being crawled, with its own frontier and budget"""
+    base_url: str
+    base_domain: str
+    max_depth: int
+    frontier: Frontier
+    stats: SiteStats
+    unchanged: FingerprintSet  # url_key()s whose sitemap <lastmod> predates the stored copy
+
+
 class WebCrawler:
     """Main web crawler class with MAX_PAGES limit"""
 
-    def __init__(self):
-        self.pdf_converter = PDFConverter()
+    def __init__(self, http_client: Optional[HttpClient] = None):
+        self.metrics = CrawlMetrics()
+        self.http_client = http_client or HttpClient(
+            limit=config.MAX_CONCURRENT,
+            limit_per_host=config.HOST_MAX_CONCURRENCY,
+            dns_cache_ttl=config.DNS_CACHE_TTL,
+            keepalive_timeout=config.KEEPALIVE_TIMEOUT,
+            timeout=config.TIMEOUT,
+            trace_configs=[self.metrics.trace_config()]
+        )
+        self.content_index = ContentIndex(config.CONTENT_INDEX_PATH, enabled=config.INCREMENTAL_CRAWL)
+        self.host_scheduler = HostScheduler(
+            delay=config.DELAY_BETWEEN_REQUESTS,
+            burst=config.HOST_BURST,
+            max_concurrency=config.HOST_MAX_CONCURRENCY,
+            slow_threshold=config.HOST_SLOW_THRESHOLD,
+            respect_robots=config.RESPECT_ROBOTS_TXT,
+            read_robots=config.SITEMAP_DISCOVERY
+        )
+        self.sitemaps = SitemapDiscovery(self.host_scheduler, config.SITEMAP_MAX_FILES, config.SITEMAP_MAX_URLS)
+        self.pdf_converter = PDFConverter(self.content_index)
+        self.content_types = ContentTypeCache(config.CONTENT_TYPE_MIN_SAMPLES)
+        self.scorer = UrlScorer(
+            depth_weight=config.PRIORITY_DEPTH_WEIGHT,
+            pdf_weight=config.PRIORITY_PDF_WEIGHT,
+            inlink_weight=config.PRIORITY_INLINK_WEIGHT,
+            freshness_weight=config.PRIORITY_FRESHNESS_WEIGHT,
+            rules=config.PRIORITY_RULES,
+            pdf_likely=self.likely_pdf
+        )
+        self.near_duplicates = NearDuplicateIndex(config.NEAR_DUPLICATE_SIMILARITY)
+        self.checkpoint: Optional[CrawlCheckpoint] = None
+        self.resume_state: Dict = {}
+        self.frontiers: Dict[str, Frontier] = {}
+        self.completed_sites: List[str] = []
+
+    def new_seen_store(self, name: str):
+        """Create a SEEN_STORE store; disk stores are named after the run so a resume reopens them"""
+        return create_seen_store(
+            config.SEEN_STORE,
+            f"{self.checkpoint.run_id}_{name}",
+            config.SEEN_DIR,
+            bloom_capacity=config.SEEN_BLOOM_CAPACITY,
+            bloom_error_rate=config.SEEN_BLOOM_ERROR_RATE,
+            memory_limit=config.SEEN_MEMORY_LIMIT
+        )
 
-    async def get_page_links(self, url: str, session: aiohttp.ClientSession) -> List[str]:
-        """Extract all links from a page"""
-        try:
-            async with session.get(url, ssl=ssl.create_default_context(cafile=certifi.where())) as response:
+    def new_error_log(self) -> ErrorLog:
+        """Error log spooling to this run's file; a resumed run appends to it"""
+        return ErrorLog(config.LOGS_DIR / f"errors_{self.checkpoint.run_id}.jsonl", sample_size=config.ERROR_SAMPLES)
+
+    def likely_pdf(self, url: str) -> bool:
+        """Guess before fetching whether a URL is a PDF, from its path or what URLs like it were"""
+        return is_pdf_url(url) or self.content_types.predict(url) == PDF
+
+    async def fetch_page(self, url: str, session: aiohttp.ClientSession, previous: Optional[IndexEntry]) -> Optional[FetchedPage]:
+        """Fetch a URL once, conditionally if a previous run stored it
+
+        The response is classified from its headers and first bytes. PDFs are
+        streamed to a temp file; for HTML, links are extracted and the body
+        hashed while it streams in. Returns None for anything else.
+        """
+        headers = ContentIndex.conditional_headers(previous)
+        requested = time.monotonic()
+        async with self.host_scheduler.slot(url, session) as slot:
+            self.metrics.observe('host_wait', slot.start - requested)
+            async with session.get(url, headers=headers) as response:
+                slot.record(response)
+                self.metrics.observe('ttfb', slot.latency)
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                if response.status == 304 and headers:
+                    return FetchedPage(str(response.url), None, etag or previous.etag, last_modified or previous.last_modified)
                 if response.status != 200:
-                    return []
+                    raise Exception(f"HTTP {response.status}")
 
-                html = await response.text()
-                soup = BeautifulSoup(html, 'html.parser')
+                head = await read_head(response)
+                kind = classify(response.headers.get('Content-Type', 'text/html'),
+                                response.headers.get('Content-Disposition', ''), head)
+                self.content_types.observe(url, kind)
+                page_url = str(response.url)
+                if kind == PDF:
+                    temp_path, checksum, size = await self.pdf_converter.write_pdf(
+                        iter_body(response, head, config.PDF_CHUNK_SIZE))
+                elif kind != HTML:
+                    logger.info(f"Skipping content that is neither HTML nor PDF "
+                                f"({response.headers.get('Content-Type', 'no Content-Type')}): {url}", extra={'url': url})
+                    return None
+                else:
+                    extractor = LinkExtractor(page_url, encoding=response.charset)
+                    checksum = checksum_hasher()
+                    chunks = []
+                    size = 0
+                    truncated = False
+                    parse_seconds = 0.0
+                    async for chunk in iter_body(response, head, config.PAGE_CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > config.MAX_PAGE_BYTES:
+                            truncated = True
+                            break
+                        parse_start = time.monotonic()
+                        extractor.feed(chunk)
+                        checksum.update(chunk)
+                        parse_seconds += time.monotonic() - parse_start
+                        chunks.append(chunk)
 
-                links = []
-                for link in soup.find_all('a', href=True):
-                    absolute_url = urljoin(url, link['href'])
-                    links.append(absolute_url)
-                    
-                logger.info(f"Extracted {len(links)} links from {url}")
-                return links
+        self.metrics.add_bytes('downloaded', size)
+        if kind == PDF:
+            self.metrics.observe('pdf_download', time.monotonic() - slot.start)
+            self.metrics.add_bytes('written', size)
+            return FetchedPage(page_url, None, etag, last_modified, content_hash=checksum, pdf_path=temp_path)
 
-        except Exception as e:
-            logger.error(f"Failed to extract links from {url}: {e}")
-            return []
-
-    async def crawl_url(self, url: str, base_domain: str, visited: Set[str], depth: int, session: aiohttp.ClientSession, stats: CrawlStats):
-        """Crawl a single URL with MAX_PAGES limit"""
-        # Termination checks
-        if (depth > config.MAX_DEPTH or 
-            url in visited or 
-            await stats.has_reached_limit()):
-            return
-        
-        visited.add(url)
-        logger.info(f"Crawling (depth {depth}): {url}")
+        body = b''.join(chunks)
+        parse_start = time.monotonic()
+        links = extractor.links()
+        self.metrics.observe('parse_hash', parse_seconds + time.monotonic() - parse_start)
+        self.metrics.observe('fetch', time.monotonic() - slot.start)
+        logger.info(f"Extracted {len(links)} links from {page_url}", extra={'url': page_url})
+        return FetchedPage(
+            page_url,
+            body.decode(html_encoding(body, response.charset), errors='replace'),
+            etag,
+            last_modified,
+            content_hash=checksum.hexdigest(),
+            links=links,
+            truncated=truncated,
+            text=extractor.text()
+        )
+
+    def near_duplicate_of(self, page: FetchedPage) -> Tuple[Optional[str], Optional[int]]:
+        """Check a fetched page against archived pages before it is rendered
+
+        Returns the URL it nearly duplicates (or None) and its SimHash, which
+        is None when detection is off or the page has too little text.
+        """
+        if not config.NEAR_DUPLICATE_DETECTION:
+            return None, None
+        with self.metrics.span('near_duplicate'):
+            fingerprint, word_count = simhash(page.text)
+        if word_count < config.NEAR_DUPLICATE_MIN_WORDS:
+            return None, None
+        return self.near_duplicates.check_and_add(fingerprint, page.url), fingerprint
+
+    async def crawl_url(self, url: str, depth: int, site: Site, session: aiohttp.ClientSession):
+        """Crawl a single URL and queue its links with MAX_PAGES limit"""
+        stats = site.stats
+        # Hold a page slot for the whole URL so concurrent workers can't overshoot
+        # the limits; wait while the remaining slots are held by URLs that may not count
+        while not stats.reserve_page():
+            if stats.has_reached_limit():
+                logger.info("Page limit reached, skipping URL", extra={'url': url})
+                return
+            await asyncio.sleep(RESERVATION_POLL_INTERVAL)
 
         try:
-            # Check again before processing (might have changed in parallel)
-            if await stats.has_reached_limit():
-                logger.info("Page limit reached, skipping URL")
+            await self.process_url(url, depth, site, session)
+        finally:
+            stats.release_page()
+
+    async def process_url(self, url: str, depth: int, site: Site, session: aiohttp.ClientSession):
+        """Fetch and archive a URL whose page slot is reserved, then queue its links"""
+        stats = site.stats
+        logger.info(f"Crawling (depth {depth}): {url}", extra={'url': url})
+
+        try:
+            if not await self.host_scheduler.allowed(url, session):
+                logger.info(f"Disallowed by robots.txt, skipping URL: {url}", extra={'url': url})
+                return
+
+            if self.content_types.predict(url) not in (None, HTML, PDF):
+                # Every response for URLs like this was neither HTML nor PDF
+                logger.info(f"Skipping URL, {url_pattern(url)} is not HTML or PDF: {url}", extra={'url': url})
                 return
 
-            # Process URL
-            if is_pdf_url(url):
-                await self.pdf_converter.download_pdf(url, session, stats)
+            # The body fetched here feeds the renderer and link extraction, or is the PDF itself
+            previous = await self.content_index.get_async(url)
+            if previous is not None and url_key(url) in site.unchanged:
+                # The sitemap says unchanged since archived: as good as a 304, without the request
+                page = FetchedPage(url, None, previous.etag, previous.last_modified)
             else:
-                await self.pdf_converter.convert_html_to_pdf(url, stats)
+                page = await self.fetch_page(url, session, previous)
+            if page is None:
+                return
+            if page.pdf_path is not None:
+                await self.pdf_converter.save_download(url, page.pdf_path, page.content_hash, page.etag,
+                                                       page.last_modified, previous, stats)
+                return
+
+            links = page.links
+            if previous is not None and previous.is_current(page.content_hash):
+                # Unchanged since the last run: keep the stored PDF and its links
+                await self.pdf_converter.keep_unchanged(url, previous, stats)
+                links = previous.links
+                if previous.simhash is not None:
+                    self.near_duplicates.add(previous.simhash, url)
+            elif page.truncated:
+                # Links found before the cap are still followed
+                error_msg = f"Page larger than {config.MAX_PAGE_BYTES} bytes, not rendered"
+                logger.warning(f"{error_msg} - URL: {url}", extra={'url': url})
+                stats.add_error(url, error_msg)
+            else:
+                original, fingerprint = self.near_duplicate_of(page)
+                if original is not None:
+                    # Links are still followed; templated pages often lead to distinct ones
+                    logger.info(f"Near-duplicate of {original}, skipping render: {url}", extra={'url': url})
+                    stats.record_near_duplicate()
+                else:
+                    filepath = await self.pdf_converter.convert_html_to_pdf(page.url, page.html, stats)
+                    if filepath is not None:
+                        await self.content_index.put_async(url, page.etag, page.last_modified, page.content_hash,
+                                                           filepath, links, simhash=fingerprint)
+                    elif fingerprint is not None:
+                        self.near_duplicates.remove(fingerprint, page.url)
 
             # Check again after processing
-            if await stats.has_reached_limit():
-                logger.info("Page limit reached after processing URL")
+            if stats.has_reached_limit():
+                logger.info("Page limit reached after processing URL", extra={'url': url})
                 return
 
-            # Only process links if we haven't reached limits
-            if depth < config.MAX_DEPTH:
-                links = await self.get_page_links(url, session)
-                logger.info(f"Found {len(links)} links on {url}")
-                
+            # Only queue links if we haven't reached limits
+            if depth < site.max_depth:
+                logger.info(f"Found {len(links)} links on {url}", extra={'url': url})
+
                 for link in links:
-                    # Exit immediately if limit reached
-                    if await stats.has_reached_limit():
-                        logger.info("MAX_PAGES limit reached, stopping link processing")
-                        break
-                    
-                    if (link not in visited and 
-                        is_valid_url(
-                            link, 
-                            base_domain, 
-                            config.EXCLUDED_KEYWORDS, 
-                            config.ALLOWED_EXTENSIONS
-                        )):
-                        await asyncio.sleep(config.DELAY_BETWEEN_REQUESTS)
-                        await self.crawl_url(link, base_domain, visited, depth + 1, session, stats)
+                    try:
+                        link = canonicalize_url(link, config.STRIP_QUERY_PARAMS)
+                    except ValueError:
+                        # Malformed href such as a non-numeric port; the other links are still followed
+                        continue
+                    if is_valid_url(
+                        link,
+                        site.base_domain,
+                        config.EXCLUDED_KEYWORDS,
+                        config.ALLOWED_EXTENSIONS
+                    ):
+                        site.frontier.add(link, depth + 1)
 
         except Exception as e:
             error_msg = f"Error crawling URL: {str(e)}"
-            logger.error(f"{error_msg} - URL: {url}")
-            await stats.add_error(url, error_msg)
+            logger.error(f"{error_msg} - URL: {url}", extra={'url': url})
+            stats.add_error(url, error_msg)
 
-    async def crawl_website(self, base_url: str, stats: CrawlStats):
-        """Crawl an entire website"""
-        base_domain = get_base_domain(base_url)
-        visited = set()
+    async def seed_from_sitemaps(self, site: Site, session: aiohttp.ClientSession):
+        """Queue the URLs listed in a site's sitemaps, noting those unchanged since archived
 
-        # Create SSL context with certifi certificates
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
-        connector = aiohttp.TCPConnector(
-            limit=config.MAX_CONCURRENT,
-            ssl=ssl_context
+        Sitemaps are untrusted input: a bad entry is skipped, and a failed
+        discovery only ends seeding, never the site's crawl.
+        """
+        seeded = 0
+        try:
+            async for entry in self.sitemaps.discover(site.base_url, session):
+                try:
+                    url = canonicalize_url(entry.url, config.STRIP_QUERY_PARAMS)
+                except ValueError:
+                    logger.warning(f"Skipping malformed sitemap URL: {entry.url}")
+                    continue
+                if not is_valid_url(url, site.base_domain, config.EXCLUDED_KEYWORDS, config.ALLOWED_EXTENSIONS):
+                    continue
+                # Disallowed URLs never reach the frontier
+                if not await self.host_scheduler.allowed(url, session):
+                    continue
+                if entry.lastmod is not None:
+                    previous = await self.content_index.get_async(url)
+                    if previous is not None and previous.unchanged_since(entry.lastmod):
+                        site.unchanged.add(url_key(url))
+                if site.frontier.add(url, 0, entry.lastmod):
+                    seeded += 1
+        except Exception as e:
+            logger.warning(f"Sitemap discovery failed for {site.base_url}: {e}")
+        logger.info(f"Seeded {seeded} URLs from sitemaps for {site.base_url}, "
+                    f"{len(site.unchanged)} unchanged since archived")
+
+    async def crawl_worker(self, site: Site, session: aiohttp.ClientSession):
+        """Drain a site's frontier until the crawl is cancelled"""
+        while True:
+            url, depth = await site.frontier.get()
+            try:
+                # Remaining items are drained without work once the limit is hit;
+                # request pacing is left to the host scheduler
+                if not site.stats.has_reached_limit():
+                    await self.crawl_url(url, depth, site, session)
+            finally:
+                site.frontier.task_done(url)
+
+    async def crawl_website(self, base_url: str, session: aiohttp.ClientSession, stats: CrawlStats):
+        """Crawl an entire website with CRAWL_WORKERS concurrent workers"""
+        max_pages, max_depth = config.site_budget(base_url)
+        seen = self.new_seen_store(f"site_{fingerprint(base_url):016x}")
+        stats.track_seen_store(f"seen_urls:{base_url}", seen)
+        saved_frontier = self.resume_state.get('frontiers', {}).get(base_url)
+        if saved_frontier is not None:
+            frontier = Frontier.restore(saved_frontier, seen, self.scorer)
+            logger.info(f"Resuming {base_url} with {len(frontier)} queued URLs")
+        else:
+            frontier = Frontier(seen, self.scorer)
+            frontier.add(canonicalize_url(base_url, config.STRIP_QUERY_PARAMS), 0)
+        self.frontiers[base_url] = frontier
+
+        site = Site(
+            base_url=base_url,
+            base_domain=get_base_domain(base_url),
+            max_depth=max_depth,
+            frontier=frontier,
+            stats=SiteStats(stats, base_url, max_pages),
+            unchanged=FingerprintSet()
         )
-        timeout = aiohttp.ClientTimeout(total=config.TIMEOUT)
+        stats.track_seen_store(f"sitemap_unchanged:{base_url}", site.unchanged)
+
+        # Every site gets the same number of workers, and the renderer pool and
+        # host slots they share are handed out first come, first served
+        workers = [
+            asyncio.create_task(self.crawl_worker(site, session))
+            for _ in range(config.CRAWL_WORKERS)
+        ]
+        # Sitemaps are read while the workers start on the base URL; a resumed
+        # run reads them again, and URLs already seen are not queued twice
+        discovery = [asyncio.create_task(self.seed_from_sitemaps(site, session))] if config.SITEMAP_DISCOVERY else []
+        try:
+            await asyncio.gather(*discovery)
+            await frontier.join()
+        finally:
+            for task in workers + discovery:
+                task.cancel()
+            await asyncio.gather(*workers, *discovery, return_exceptions=True)
+
+        self.completed_sites.append(base_url)
+        del self.frontiers[base_url]
 
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            await self.crawl_url(base_url, base_domain, visited, 0, session, stats)
+    async def crawl_site(self, base_url: str, session: aiohttp.ClientSession, stats: CrawlStats) -> bool:
+        """Crawl one site, recording a failure instead of letting it end the other sites' crawls"""
+        try:
+            await self.crawl_website(base_url, session, stats)
+            return True
+        except Exception as e:
+            error_msg = f"Site crawl failed: {str(e)}"
+            logger.error(f"{error_msg} - URL: {base_url}", extra={'url': base_url})
+            stats.add_error(base_url, error_msg)
+            return False
 
-    async def run_crawl(self) -> CrawlStats:
-        """Run the complete crawling process"""
-        stats = CrawlStats(config.MAX_PAGES)
-        logger.info("Starting crawl process...")
+    def checkpoint_state(self, stats: CrawlStats, finished: bool) -> Dict:
+        """Collect everything needed to resume this run"""
+        return {
+            'run_id': self.checkpoint.run_id,
+            'saved_at': datetime.now().isoformat(),
+            'finished': finished,
+            'completed_sites': list(self.completed_sites),
+            'frontiers': {base_url: frontier.snapshot() for base_url, frontier in self.frontiers.items()},
+            'near_duplicates': self.near_duplicates.snapshot(),
+            'content_types': self.content_types.snapshot(),
+            'stats': stats.state_dict()
+        }
 
+    async def save_checkpoint(self, stats: CrawlStats, finished: bool = False):
+        """Snapshot the crawl on the loop, then write it off the loop
+
+        checkpoint_state() only returns copies, so json.dump in the executor
+        never walks containers the loop is changing.
+        """
+        state = self.checkpoint_state(stats, finished)
+        loop = asyncio.get_running_loop()
         try:
-            # Process each base URL
-            for base_url in config.BASE_URLS:
-                if await stats.has_reached_limit():
-                    logger.info("Page limit reached before processing base URL")
-                    break
-                    
-                logger.info(f"Processing base URL: {base_url}")
-                await self.crawl_website(base_url, stats)
+            await loop.run_in_executor(None, self.checkpoint.save, state)
+        except Exception as e:
+            logger.error(f"Failed to save checkpoint: {e}")
+
+    async def checkpoint_loop(self, stats: CrawlStats):
+        """Save a checkpoint every CHECKPOINT_INTERVAL seconds"""
+        while True:
+            await asyncio.sleep(config.CHECKPOINT_INTERVAL)
+            await self.save_checkpoint(stats)
+
+    async def run_crawl(self, resume_run_id: Optional[str] = None) -> CrawlStats:
+        """Run the complete crawling process, optionally resuming a checkpointed run"""
+        if resume_run_id:
+            self.checkpoint = CrawlCheckpoint(resume_run_id, config.CHECKPOINTS_DIR)
+            if not self.checkpoint.exists():
+                raise ValueError(f"No checkpoint found for run {resume_run_id}")
+            self.resume_state = self.checkpoint.load()
+            self.completed_sites = list(self.resume_state['completed_sites'])
+            stats = CrawlStats(config.MAX_PAGES, self.new_seen_store('pdf_checksums'), self.metrics, self.new_error_log())
+            stats.load_state(self.resume_state['stats'])
+            self.near_duplicates.restore(self.resume_state.get('near_duplicates', []))
+            self.content_types.restore(self.resume_state.get('content_types', {}))
+            logger.info(f"Resuming crawl run {resume_run_id}...")
+        else:
+            self.checkpoint = CrawlCheckpoint.new(config.CHECKPOINTS_DIR)
+            stats = CrawlStats(config.MAX_PAGES, self.new_seen_store('pdf_checksums'), self.metrics, self.new_error_log())
+            logger.info(f"Starting crawl run {self.checkpoint.run_id}...")
+        self.pdf_converter.pdf_store.begin_run(self.checkpoint.run_id)
+
+        checkpoint_task = asyncio.create_task(self.checkpoint_loop(stats))
+        finished = False
+
+        try:
+            sites = [base_url for base_url in config.BASE_URLS if base_url not in self.completed_sites]
+            for base_url in set(config.BASE_URLS) - set(sites):
+                logger.info(f"Already crawled in this run, skipping base URL: {base_url}")
+
+            # All sites run at once on one shared session and connection pool
+            session = self.http_client.session
+            logger.info(f"Processing base URLs: {sites}")
+            results = await asyncio.gather(*(self.crawl_site(base_url, session, stats) for base_url in sites))
+
+            # A failed site keeps its frontier in the checkpoint so a resume retries it
+            finished = all(results)
 
         except Exception as e:
             logger.error(f"Critical error during crawl: {e}")
-            await stats.add_error("SYSTEM", str(e))
+            stats.add_error("SYSTEM", str(e))
 
         finally:
+            checkpoint_task.cancel()
+            await self.save_checkpoint(stats, finished)
             self.pdf_converter.cleanup()
+            self.content_index.close()
+            await self.http_client.close()
+            for store in stats.seen_stores.values():
+                store.close()
+            stats.errors.close()
 
+        usage = stats.seen_store_usage()
+        logger.info(f"Seen-stores ({config.SEEN_STORE}): {sum(u['entries'] for u in usage.values())} entries, "
+                    f"{sum(u['memory_bytes'] for u in usage.values()) / 1024:.1f} KiB")
         logger.info("Crawl process completed")
         return stats
\ No newline at end of file
@@ -0,0 +1,316 @@
+import json
+import logging
+import math
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WORK_QUEUE_BACKENDS = ('sqlite',)
+
+class Lease(NamedTuple):
+    """A URL handed to one worker until lease_expires"""
+    key: str
+    url: str
+    site: str
+    depth: int
+    lastmod: Optional[str]
+
+
+class QueuedUrl(NamedTuple):
+    """A discovered URL on its way into the queue"""
+    key: str
+    url: str
+    site: str
+    depth: int
+    base_score: float  # priority score without the in-link bonus
+    lastmod: Optional[str] = None
+
+
+class SQLiteWorkQueue:
+    """Frontier, dedup index and page budgets of a distributed run, in one SQLite file
+
+    WAL mode lets any number of processes on one machine (or a shared
+    filesystem with working locks) read while one writes; every change is a
+    short BEGIN IMMEDIATE transaction. URLs move queued -> leased -> done, or
+    to skipped once a budget is used up, or to failed after max_attempts
+    expired leases. A lease that is not renewed or completed in time goes
+    back to queued on the next lease() call.
+    """
+
+    kind = 'sqlite'
+
+    def __init__(self, path: Path, inlink_weight: float = 0.0, max_attempts: int = 3):
+        self.path = path
+        self.inlink_weight = inlink_weight
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(str(path), timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.create_function('log2', 1, math.log2, deterministic=True)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS urls (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                site TEXT NOT NULL,
+                depth INTEGER NOT NULL,
+                base_score REAL NOT NULL,
+                inlinks INTEGER NOT NULL DEFAULT 1,
+                score REAL NOT NULL,
+                lastmod TEXT,
+                state TEXT NOT NULL DEFAULT 'queued',
+                owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS urls_by_state ON urls (state, score DESC);
+            CREATE TABLE IF NOT EXISTS sites (
+                base_url TEXT PRIMARY KEY,
+                base_domain TEXT NOT NULL,
+                max_pages INTEGER NOT NULL,
+                max_depth INTEGER NOT NULL,
+                pages INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS workers (worker_id TEXT PRIMARY KEY, heartbeat REAL, stats TEXT,
+                                                 done INTEGER NOT NULL DEFAULT 0);
+            CREATE TABLE IF NOT EXISTS checksums (checksum TEXT PRIMARY KEY);
+        ''')
+
+    @contextmanager
+    def transaction(self):
+        """One write transaction, taking the database write lock up front"""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    def setup(self, run_id: str, max_pages: int, sites: Iterable[Tuple[str, str, int, int]]):
+        """Record the run and its (base_url, base_domain, max_pages, max_depth) site budgets"""
+        with self.transaction() as conn:
+            conn.executemany('INSERT OR IGNORE INTO meta (name, value) VALUES (?, ?)', [
+                ('run_id', run_id),
+                ('max_pages', str(max_pages)),
+                ('pages', '0'),
+                ('started_at', datetime.now().isoformat()),
+                ('seeding', '1'),
+                ('finished', '0')
+            ])
+            conn.executemany('INSERT OR IGNORE INTO sites (base_url, base_domain, max_pages, max_depth) VALUES (?, ?, ?, ?)',
+                             list(sites))
+
+    def meta(self, name: str) -> Optional[str]:
+        row = self.conn.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name: str, value: str):
+        with self.transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, value))
+
+    def sites(self) -> Dict[str, Tuple[str, int, int]]:
+        """Get base_url -> (base_domain, max_pages, max_depth)"""
+        return {
+            base_url: (base_domain, max_pages, max_depth)
+            for base_url, base_domain, max_pages, max_depth in
+            self.conn.execute('SELECT base_url, base_domain, max_pages, max_depth FROM sites')
+        }
+
+    def _add(self, conn: sqlite3.Connection, urls: Iterable[QueuedUrl]):
+        # Scores match UrlScorer: base + inlink_weight * log2(1 + in-links). A URL
+        # already queued gains an in-link; one leased, done or skipped stays as it is
+        conn.executemany('''
+            INSERT INTO urls (key, url, site, depth, base_score, score, lastmod)
+            VALUES (:key, :url, :site, :depth, :base_score, :base_score + :inlink_weight, :lastmod)
+            ON CONFLICT (key) DO UPDATE SET
+                inlinks = inlinks + 1,
+                score = base_score + :inlink_weight * log2(inlinks + 2)
+            WHERE state = 'queued'
+        ''', [dict(item._asdict(), inlink_weight=self.inlink_weight) for item in urls])
+
+    def add(self, urls: List[QueuedUrl]):
+        """Queue URLs not seen before in this run"""
+        if urls:
+            with self.transaction() as conn:
+                self._add(conn, urls)
+
+    def lease(self, worker_id: str, count: int, lease_seconds: float) -> List[Lease]:
+        """Hand up to count of the best queued URLs to a worker, within the page budgets
+
+        URLs being worked on hold a slot of their site's and the run's budget,
+        as CrawlStats.reserve_page() does for a single process.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            expired = conn.execute(
+                "UPDATE urls SET state = 'queued', owner = NULL WHERE state = 'leased' AND lease_expires < ?", (now,)
+            ).rowcount
+            if expired:
+                logger.info(f"Re-queued {expired} URLs whose lease expired")
+            conn.execute("UPDATE urls SET state = 'failed' WHERE state = 'queued' AND attempts >= ?", (self.max_attempts,))
+
+            leased = dict(conn.execute("SELECT site, COUNT(*) FROM urls WHERE state = 'leased' GROUP BY site").fetchall())
+            run_max = int(self._meta(conn, 'max_pages'))
+            run_pages = int(self._meta(conn, 'pages'))
+            if run_pages >= run_max:
+                conn.execute("UPDATE urls SET state = 'skipped' WHERE state = 'queued'")
+                return []
+            run_left = run_max - run_pages - sum(leased.values())
+
+            site_left = {}
+            for base_url, max_pages, pages in conn.execute('SELECT base_url, max_pages, pages FROM sites').fetchall():
+                if max_pages and pages >= max_pages:
+                    conn.execute("UPDATE urls SET state = 'skipped' WHERE state = 'queued' AND site = ?", (base_url,))
+                    continue
+                site_left[base_url] = max_pages - pages - leased.get(base_url, 0) if max_pages else count
+            open_sites = [base_url for base_url, left in site_left.items() if left > 0]
+            count = min(count, run_left)
+            if count <= 0 or not open_sites:
+                return []
+
+            rows = conn.execute(
+                f"SELECT key, url, site, depth, lastmod FROM urls WHERE state = 'queued' "
+                f"AND site IN ({','.join('?' * len(open_sites))}) ORDER BY score DESC, rowid LIMIT ?",
+                (*open_sites, count)
+            ).fetchall()
+            leases = []
+            for row in rows:
+                lease = Lease(*row)
+                if site_left[lease.site] <= 0:
+                    continue
+                site_left[lease.site] -= 1
+                leases.append(lease)
+            conn.executemany(
+                "UPDATE urls SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE key = ?",
+                [(worker_id, now + lease_seconds, lease.key) for lease in leases]
+            )
+        return leases
+
+    def complete(self, worker_id: str, lease: Lease, counted: bool, links: List[QueuedUrl]):
+        """Finish a leased URL, counting it against the budgets if it was archived, and queue its links
+
+        A lease that expired and went to another worker is not counted twice.
+        """
+        with self.transaction() as conn:
+            owned = conn.execute(
+                "UPDATE urls SET state = 'done', owner = NULL WHERE key = ? AND state = 'leased' AND owner = ?",
+                (lease.key, worker_id)
+            ).rowcount
+            if owned and counted:
+                conn.execute('UPDATE sites SET pages = pages + 1 WHERE base_url = ?', (lease.site,))
+                conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'pages'")
+            self._add(conn, links)
+
+    def release(self, worker_id: str, lease: Lease):
+        """Put a leased URL that was not finished back in the queue"""
+        with self.transaction() as conn:
+            conn.execute("UPDATE urls SET state = 'queued', owner = NULL WHERE key = ? AND state = 'leased' AND owner = ?",
+                         (lease.key, worker_id))
+
+    def heartbeat(self, worker_id: str, lease_seconds: float, stats: Optional[Dict] = None, done: bool = False):
+        """Renew a worker's leases and store its CrawlStats.state_dict(); done marks its last report"""
+        with self.transaction() as conn:
+            conn.execute("UPDATE urls SET lease_expires = ? WHERE state = 'leased' AND owner = ?",
+                         (time.time() + lease_seconds, worker_id))
+            if stats is not None:
+                conn.execute('INSERT OR REPLACE INTO workers (worker_id, heartbeat, stats, done) VALUES (?, ?, ?, ?)',
+                             (worker_id, time.time(), json.dumps(stats, default=str), int(done)))
+
+    def active_workers(self, max_age: float) -> int:
+        """Count workers not done that sent a heartbeat within max_age seconds"""
+        return self.conn.execute('SELECT COUNT(*) FROM workers WHERE done = 0 AND heartbeat > ?',
+                                 (time.time() - max_age,)).fetchone()[0]
+
+    def worker_stats(self) -> Dict[str, Dict]:
+        """Get the last stats every worker reported"""
+        return {worker_id: json.loads(stats) for worker_id, stats in
+                self.conn.execute('SELECT worker_id, stats FROM workers WHERE stats IS NOT NULL')}
+
+    def counts(self) -> Dict[str, int]:
+        """Get the number of URLs in each state"""
+        return dict(self.conn.execute('SELECT state, COUNT(*) FROM urls GROUP BY state').fetchall())
+
+    def finished(self) -> bool:
+        """Check seeding is over and no URL is queued or leased"""
+        if self.meta('seeding') == '1':
+            return False
+        return self.conn.execute("SELECT 1 FROM urls WHERE state IN ('queued', 'leased') LIMIT 1").fetchone() is None
+
+    def add_checksum(self, checksum: str) -> bool:
+        """Record a PDF checksum for the whole run, returning False if it was already there"""
+        return self.conn.execute('INSERT OR IGNORE INTO checksums (checksum) VALUES (?)', (checksum,)).rowcount == 1
+
+    def has_checksum(self, checksum: str) -> bool:
+        return self.conn.execute('SELECT 1 FROM checksums WHERE checksum = ?', (checksum,)).fetchone() is not None
+
+    def checksum_count(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM checksums').fetchone()[0]
+
+    @staticmethod
+    def _meta(conn: sqlite3.Connection, name: str) -> Optional[str]:
+        row = conn.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def latest_unfinished(directory: Path) -> Optional[str]:
+        """Get the run id of the newest queue whose run has not finished"""
+        for path in sorted(directory.glob('*.sqlite'), reverse=True):
+            queue = SQLiteWorkQueue(path)
+            try:
+                if queue.meta('finished') != '1':
+                    return path.stem
+            finally:
+                queue.close()
+        return None
+
+    def close(self):
+        self.conn.close()
+
+
+class SharedChecksums:
+    """Seen-store interface over the run's checksums table, so workers skip each other's duplicate PDFs
+
+    Uses its own connection. add() may wait for another process's write
+    lock, so CrawlWorker has PDFConverter call it on the queue thread.
+    """
+
+    kind = 'shared'
+
+    def __init__(self, path: Path):
+        self.queue = SQLiteWorkQueue(path)
+
+    def add(self, value: str) -> bool:
+        return self.queue.add_checksum(value)
+
+    def __contains__(self, value: str) -> bool:
+        return self.queue.has_checksum(value)
+
+    def __len__(self) -> int:
+        return self.queue.checksum_count()
+
+    def memory_bytes(self) -> int:
+        return 0
+
+    def snapshot(self) -> List:
+        # Already on disk
+        return []
+
+    def restore(self, data):
+        pass
+
+    def close(self):
+        self.queue.close()
+
+
+def open_work_queue(backend: str, directory: Path, run_id: str, inlink_weight: float = 0.0,
+                    max_attempts: int = 3) -> SQLiteWorkQueue:
+    """Open (creating if needed) the work queue of a distributed run"""
+    if backend == 'sqlite':
+        return SQLiteWorkQueue(directory / f"{run_id}.sqlite", inlink_weight, max_attempts)
+    raise ValueError(f"Unknown work queue backend: {backend}")
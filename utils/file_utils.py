@@ -1,7 +1,9 @@
 import hashlib
+import uuid
 from pathlib import Path
 from urllib.parse import urlparse
 from datetime import datetime
+from utils.url_utils import canonicalize_url, url_key
 
 def create_directories(directories: list):
     """Create necessary directories"""
@@ -10,7 +12,8 @@ def create_directories(directories: list):
 
 def generate_filename(url: str, is_pdf: bool = False) -> str:
     """Generate a standardized filename for saved content"""
-    parsed = urlparse(url)
+    # Equivalent spellings of a URL share a name
+    parsed = urlparse(url_key(canonicalize_url(url)))
     domain = parsed.netloc.replace('www.', '').replace('.', '_')
     
     # Create a clean path representation
@@ -31,4 +34,12 @@ def generate_filename(url: str, is_pdf: bool = False) -> str:
 
 def calculate_checksum(content: bytes) -> str:
     """Calculate MD5 checksum of content"""
-    return hashlib.md5(content).hexdigest()
\ No newline at end of file
+    return hashlib.md5(content).hexdigest()
+
+def checksum_hasher():
+    """Create an incremental hasher matching calculate_checksum"""
+    return hashlib.md5()
+
+def temp_file_path(directory: Path) -> Path:
+    """Get a unique hidden path for a file that is still being written"""
+    return directory / f".{uuid.uuid4().hex}.part"
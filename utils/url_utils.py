@@ -1,5 +1,18 @@
-from urllib.parse import urlparse
+import re
+from fnmatch import fnmatchcase
+from html import escape
+from urllib.parse import urlparse, urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
 from pathlib import Path
+from typing import Iterable
+
+BASE_HREF_RE = re.compile(r'<base\b[^>]*?\bhref\s*=\s*["\']?([^"\'\s>]+)', re.IGNORECASE)
+SESSION_PATH_PARAM_RE = re.compile(r';(jsessionid|phpsessid|sid)=[^/?#]*', re.IGNORECASE)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+INSERT_AFTER_RES = [
+    re.compile(r'<head\b[^>]*>', re.IGNORECASE),
+    re.compile(r'<html\b[^>]*>', re.IGNORECASE),
+    re.compile(r'<!doctype\b[^>]*>', re.IGNORECASE),
+]
 
 def is_valid_url(url: str, base_domain: str, excluded_keywords: list, allowed_extensions: set) -> bool:
     """Check if URL should be crawled"""
@@ -7,7 +20,7 @@ def is_valid_url(url: str, base_domain: str, excluded_keywords: list, allowed_ex
         parsed = urlparse(url)
         
         # Must be same domain
-        if parsed.netloc != base_domain:
+        if normalize_host(parsed.netloc) != normalize_host(base_domain):
             return False
         
         # Check for excluded keywords
@@ -29,9 +42,68 @@ def is_valid_url(url: str, base_domain: str, excluded_keywords: list, allowed_ex
         return False
 
 def is_pdf_url(url: str) -> bool:
-    """Check if URL points to a PDF file"""
-    return url.lower().endswith('.pdf') or 'pdf' in url.lower()
+    """Check if a URL's path names a PDF file; the crawler goes by the response instead"""
+    return urlparse(url).path.lower().endswith('.pdf')
 
 def get_base_domain(url: str) -> str:
     """Extract base domain from URL"""
-    return urlparse(url).netloc
\ No newline at end of file
+    return normalize_host(urlparse(url).netloc)
+
+def with_base_href(html: str, url: str) -> str:
+    """Make relative references in a detached HTML document resolve against url"""
+    match = BASE_HREF_RE.search(html)
+    if match:
+        # Keep the page's own base, but make it absolute
+        return html[:match.start(1)] + escape(urljoin(url, match.group(1)), quote=True) + html[match.end(1):]
+
+    base_tag = f'<base href="{escape(url, quote=True)}">'
+    for pattern in INSERT_AFTER_RES:
+        tag = pattern.search(html)
+        if tag:
+            return html[:tag.end()] + base_tag + html[tag.end():]
+    return base_tag + html
+
+
+def normalize_host(netloc: str) -> str:
+    """Lower-case a host and drop the www. prefix and any default port"""
+    host = netloc.lower().rsplit('@', 1)[-1]
+    for port in (':80', ':443'):
+        if host.endswith(port):
+            host = host[:-len(port)]
+    if host.startswith('www.'):
+        host = host[4:]
+    return host
+
+def canonicalize_url(url: str, strip_params: Iterable[str] = ()) -> str:
+    """Normalize a URL so trivially different spellings of a page compare equal
+
+    Lower-cases scheme and host, drops default ports, fragments and session
+    path parameters, removes query parameters matching strip_params (fnmatch
+    patterns such as 'utm_*') and sorts the rest. The result stays fetchable.
+    """
+    parsed = urlsplit(url.strip())
+    scheme = parsed.scheme.lower()
+
+    host = (parsed.hostname or '').lower()
+    if ':' in host:
+        # hostname strips the brackets of IPv6 literals
+        host = f"[{host}]"
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parsed.port}"
+
+    path = SESSION_PATH_PARAM_RE.sub('', parsed.path) or '/'
+
+    patterns = [pattern.lower() for pattern in strip_params]
+    query = [
+        (name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not any(fnmatchcase(name.lower(), pattern) for pattern in patterns)
+    ]
+    query.sort()
+
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+def url_key(url: str) -> str:
+    """Get the dedup key of a canonical URL (www. and trailing slash ignored)"""
+    parsed = urlsplit(url)
+    path = parsed.path.rstrip('/') or '/'
+    return urlunsplit((parsed.scheme, normalize_host(parsed.netloc), path, parsed.query, ''))